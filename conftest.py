@@ -0,0 +1 @@
+"""Puts the repository root on the import path, so the tests import simuas with a plain pytest"""
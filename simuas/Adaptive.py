@@ -0,0 +1,135 @@
+"""Sequential stopping rule for replications
+Replications are run in waves until the confidence interval of every key output is narrow enough
+relative to its mean, or the maximum number of replications is reached
+"""
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from simuas.main import OPTIONS, MAX_SIM_TIME, N_REPLICATIONS, run_replication, init_worker
+from simuas.RandomStreams import BASE_SEED
+from simuas.EventLog import UAS_COLLISION, count_events
+from simuas.Statistics import RunningStats
+
+MIN_REPLICATIONS = 5
+# Relative half width of the confidence interval every metric must reach
+PRECISION = 0.05
+CONFIDENCE = 0.95
+
+
+def mean_total_wait(data_pfs):
+    return np.nanmean(np.concatenate([data_pf['packages']['total_wait'] for data_pf in data_pfs]))
+
+
+def mean_uas_wait(data_pfs):
+    return np.nanmean(np.concatenate([data_pf['packages']['uas_wait'] for data_pf in data_pfs]))
+
+
+def mean_battery_bank_level(data_pfs):
+    """Time weighted battery bank level, averaged over the package centers"""
+    levels = []
+    for data_pf in data_pfs:
+        occupancy = data_pf['battery_bank']['item_time_dict']
+        minutes = sum(occupancy.values())
+        levels.append(sum(level * time for level, time in occupancy.items()) / minutes if minutes else np.nan)
+    return np.nanmean(levels)
+
+
+def collision_count(data_pfs):
+    return sum(count_events(data_pf['info'], UAS_COLLISION) for data_pf in data_pfs)
+
+
+# Key outputs of a replication, name -> function of the data packages of every package center
+METRICS = OrderedDict([
+    ('total_wait', mean_total_wait),
+    ('uas_wait', mean_uas_wait),
+    ('battery_bank_level', mean_battery_bank_level),
+    ('collisions', collision_count),
+])
+
+
+class AdaptiveReplications(object):
+    """Keeps running statistics of the key outputs and decides when to stop
+
+    Keyword Arguments:
+        precision {float} -- Relative half width every metric must reach (default: {PRECISION})
+        confidence {float} -- Confidence level of the interval (default: {CONFIDENCE})
+        min_replications {int} -- Replications before the rule is checked (default: {MIN_REPLICATIONS})
+        max_replications {int} -- Cap on the number of replications (default: {N_REPLICATIONS})
+        metrics {dict} -- name -> function of a replication (default: {METRICS})
+    """
+
+    def __init__(self, precision=PRECISION, confidence=CONFIDENCE, min_replications=MIN_REPLICATIONS,
+                 max_replications=N_REPLICATIONS, metrics=METRICS):
+        self.precision = precision
+        self.confidence = confidence
+        self.min_replications = max(min_replications, 2)
+        self.max_replications = max_replications
+        self.metrics = metrics
+        self.stats = OrderedDict((name, RunningStats()) for name in metrics)
+        self.n = 0
+
+    def add(self, data_pfs):
+        for name, metric in self.metrics.items():
+            self.stats[name].add(float(metric(data_pfs)))
+        self.n += 1
+
+    def converged(self, name):
+        stats = self.stats[name]
+        half_width = stats.half_width(self.confidence)
+        # A metric that is always zero (e.g. no collisions) has a half width of zero
+        return half_width == 0 or half_width <= self.precision * abs(stats.mean)
+
+    def done(self):
+        if self.n >= self.max_replications:
+            return True
+        return self.n >= self.min_replications and all(self.converged(name) for name in self.stats)
+
+    def summary(self):
+        """name -> (mean, half width, converged)"""
+        return OrderedDict((name, (stats.mean, stats.half_width(self.confidence), self.converged(name)))
+                           for name, stats in self.stats.items())
+
+    def wave_size(self, workers):
+        """Number of replications of the next wave, at least one per worker"""
+        if self.n < self.min_replications:
+            size = self.min_replications - self.n
+        else:
+            size = 1
+        size = int(np.ceil(size / workers)) * workers
+        return min(size, self.max_replications - self.n)
+
+    def run(self, options=OPTIONS, workers=1, seed=BASE_SEED, max_sim_time=MAX_SIM_TIME, on_result=None,
+            level=logging.WARN):
+        """Runs replications in waves until the stopping rule is met
+
+        Keyword Arguments:
+            on_result {callable} -- Called with (replication, data_pfs) in replication order, e.g. ResultWriter.write
+
+        Returns:
+            OrderedDict -- The summary of every metric
+        """
+        executor = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(level,)) if workers > 1 else None
+        try:
+            while not self.done():
+                replications = range(self.n, self.n + self.wave_size(workers))
+                if executor is None:
+                    results = (run_replication(i, options, seed, max_sim_time) for i in replications)
+                else:
+                    results = executor.map(run_replication, replications, repeat(options), repeat(seed),
+                                           repeat(max_sim_time))
+                # Every wave is added in replication order, so the stopping point does not depend on timing
+                for replication, data_pfs in zip(replications, results):
+                    self.add(data_pfs)
+                    if on_result is not None:
+                        on_result(replication, data_pfs)
+                logging.info('%d replications: %s', self.n, ', '.join(
+                    '{} {:.3f} +- {:.3f}'.format(name, mean, half_width)
+                    for name, (mean, half_width, _) in self.summary().items()))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return self.summary()
@@ -0,0 +1,133 @@
+"""Shared airspace of every package center in a replication
+Owns every UAS and every active flight leg, whichever package center launched it
+"""
+import math
+from collections import defaultdict
+
+from simuas.SpatialIndex import TimeWindowIndex, GRID_CELL_SIZE, line_within_bbox
+from simuas.Fleet import Fleet, FLIGHT_PACKAGE
+
+
+class ExclusionZones(object):
+    """Bounding boxes around package centers where no collision can happen
+    Zones are bucketed by grid cell, so a lookup only tests the zones near a line
+    """
+
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.zones = []
+        self.cells = defaultdict(list)
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def add(self, bbox):
+        self.zones.append(bbox)
+        x_min, y_min = self._cell(bbox[0], bbox[1])
+        x_max, y_max = self._cell(bbox[2], bbox[3])
+        for i in range(x_min, x_max + 1):
+            for j in range(y_min, y_max + 1):
+                self.cells[(i, j)].append(bbox)
+
+    def contains(self, line):
+        """True if the line lies completely inside of any zone"""
+        # A zone that holds the line holds its start point, so it is in the cell of the start point
+        zones = self.cells.get(self._cell(line.start.x, line.start.y), ())
+        return any(line_within_bbox(line, zone) for zone in zones)
+
+
+class Airspace(object):
+    """Holds the fleet and flight legs of every package center
+
+    Arguments:
+        index {Database, GridIndex} -- Collision backend, holds paths for the buffered path intersection and collisions
+
+    Keyword Arguments:
+        conflict_engine {ClosestApproach} -- Analytic closest approach engine, None uses the buffered path intersection (default: {None})
+        cell_size {float} -- Width (meters) of a grid cell of the time windows and exclusion zones (default: {GRID_CELL_SIZE})
+    """
+
+    def __init__(self, index, conflict_engine=None, cell_size=GRID_CELL_SIZE):
+        self.index = index
+        self.conflict_engine = conflict_engine
+        # Time every leg spends in each grid cell, legs that are never near each other at the same time
+        # are dropped before any geometry is tested
+        self.windows = TimeWindowIndex(cell_size)
+        self.zones = ExclusionZones(cell_size)
+        self.facilities = {}
+        self.fleet = Fleet()
+
+    def add_facility(self, facility):
+        self.facilities[facility.uid] = facility
+        self.zones.add(facility.bbox_center)
+
+    def start_leg(self, uas, exclusion=0):
+        """Records the planned path of the UAS so other UAS can check against it
+
+        Arguments:
+            uas {int} -- Id of the UAS that begins a new leg, its path is set in the fleet
+
+        Keyword Arguments:
+            exclusion {float} -- Distance around its package center where collisions are ignored (default: {0})
+        """
+        fleet = self.fleet
+        path, center_uid = fleet.path(uas), int(fleet.uas_center[uas])
+        start_time, speed = float(fleet.path_start_time[uas]), float(fleet.uas_speed[uas])
+        if self.conflict_engine is None:
+            self.index.insert_path(uas, path, center_uid, start_time)
+            # The time of a buffered intersection is clamped by up to the exclusion distance, see time_bounds
+            self.windows.insert(uas, path, start_time, speed, pad=exclusion)
+            return
+        # Collisions are ignored inside the package center bounding box
+        if fleet.uas_state[uas] == FLIGHT_PACKAGE:
+            exclusion_start, exclusion_end = exclusion, 0
+        else:
+            exclusion_start, exclusion_end = 0, exclusion
+        self.conflict_engine.add_flight(uas, path, start_time, speed, exclusion_start, exclusion_end)
+        self.windows.insert(uas, path, start_time, speed)
+
+    def change_leg(self, uas, exclusion=0):
+        """Replaces the recorded path of the UAS with its new path"""
+        if self.conflict_engine is None:
+            fleet = self.fleet
+            path, start_time = fleet.path(uas), float(fleet.path_start_time[uas])
+            self.index.update_path(uas, path, int(fleet.uas_center[uas]), start_time)
+            self.windows.insert(uas, path, start_time, float(fleet.uas_speed[uas]), pad=exclusion)
+        else:
+            self.start_leg(uas, exclusion)
+
+    def end_leg(self, uas):
+        if self.conflict_engine is None:
+            self.index.remove_path(uas)
+        else:
+            self.conflict_engine.remove_flight(uas)
+        self.windows.remove(uas)
+
+    def path_intersections(self, uas, bbox):
+        """Finds the buffered path intersections of the UAS with every other active path
+        Intersections inside of bbox, or the exclusion zone of any package center, are ignored.
+        Only paths that are flown at the same time as the UAS flies the stretch they share are intersected
+        """
+        candidates = self.windows.overlapping(uas)
+        if not candidates:
+            return []
+        return [path for path in self.index.get_path_intersection(uas, bbox, candidates)
+                if not self.zones.contains(path['b_geom'])]
+
+    def conflicts(self, uas):
+        """Finds every active flight that comes closer than the separation distance to the UAS
+        Only flights in the grid cells of its path at the same time are solved for, conflicts inside of an exclusion zone are ignored
+
+        Returns:
+            list -- Tuples of (Conflict, a_geom, b_geom), the geometries are where each UAS is during the conflict
+        """
+        engine = self.conflict_engine
+        candidates = self.windows.concurrent(uas)
+        results = []
+        for conflict in engine.check(uas, candidates):
+            a_geom = engine.segment(uas, conflict.time_enter, conflict.time_exit)
+            if self.zones.contains(a_geom):
+                continue
+            b_geom = engine.segment(conflict.uid, conflict.time_enter, conflict.time_exit)
+            results.append((conflict, a_geom, b_geom))
+        return results
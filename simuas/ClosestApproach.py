@@ -0,0 +1,174 @@
+"""Analytic space-time collision model for straight line UAS paths
+Every flight leg is a constant velocity segment, so the separation between two UAS is a quadratic in time.
+We solve for the minimum separation, when it happens, and the exact window the UAS are closer than the
+separation distance.
+"""
+from collections import namedtuple
+import numpy as np
+
+from simuas.Util import Point, Line
+from simuas.Database import RADIUS_BUFFER
+
+# Minimum distance (meters) two UAS may be apart before it is a collision
+SEPARATION_DISTANCE = RADIUS_BUFFER
+
+# Tolerance used to decide if two UAS have the same velocity
+EPSILON = 1e-9
+
+# Columns of the flight table
+SX, SY, VX, VY, T0, E0, E1 = range(7)
+
+Conflict = namedtuple('Conflict', ['uid', 'time', 'distance', 'time_enter', 'time_exit'])
+
+
+def closest_approach(flights_a, flights_b, separation=SEPARATION_DISTANCE):
+    """Computes the closest approach of every flight in flights_a to every flight in flights_b
+
+    Arguments:
+        flights_a {ndarray} -- (N, 7) flight table (start x/y, velocity x/y, start time, exposure start and end time)
+        flights_b {ndarray} -- (M, 7) flight table
+
+    Keyword Arguments:
+        separation {float} -- Minimum allowed separation distance (default: {SEPARATION_DISTANCE})
+
+    Returns:
+        dict -- (N, M) arrays of 'conflict', 'time', 'distance', 'time_enter' and 'time_exit'
+    """
+    a = np.asarray(flights_a, dtype=float)[:, None, :]
+    b = np.asarray(flights_b, dtype=float)[None, :, :]
+
+    # Both UAS must be exposed at the same time
+    low = np.maximum(a[..., E0], b[..., E0])
+    high = np.minimum(a[..., E1], b[..., E1])
+    overlap = high >= low
+    span = np.where(overlap, high - low, 0.0)
+
+    # Relative position at the start of the shared window and relative velocity
+    rx = (a[..., SX] + a[..., VX] * (low - a[..., T0])) - (b[..., SX] + b[..., VX] * (low - b[..., T0]))
+    ry = (a[..., SY] + a[..., VY] * (low - a[..., T0])) - (b[..., SY] + b[..., VY] * (low - b[..., T0]))
+    wx = a[..., VX] - b[..., VX]
+    wy = a[..., VY] - b[..., VY]
+
+    ww = wx * wx + wy * wy
+    rw = rx * wx + ry * wy
+    rr = rx * rx + ry * ry
+    moving = ww > EPSILON
+    safe_ww = np.where(moving, ww, 1.0)
+
+    # Closest approach inside of the shared window
+    tau = np.where(moving, np.clip(-rw / safe_ww, 0.0, span), 0.0)
+    distance = np.sqrt(np.maximum(rr + 2 * rw * tau + ww * tau * tau, 0.0))
+
+    # Window where |r + w * tau| <= separation
+    disc = rw * rw - ww * (rr - separation * separation)
+    root = np.sqrt(np.maximum(disc, 0.0))
+    enter = np.where(moving, np.clip((-rw - root) / safe_ww, 0.0, span), 0.0)
+    exit_ = np.where(moving, np.clip((-rw + root) / safe_ww, 0.0, span), span)
+
+    conflict = overlap & (distance <= separation)
+    return {
+        'conflict': conflict,
+        'time': low + tau,
+        'distance': distance,
+        'time_enter': low + enter,
+        'time_exit': low + exit_,
+    }
+
+
+def flight_row(line: Line, start_time, speed, exclusion_start=0, exclusion_end=0):
+    """Creates a row of the flight table for a constant velocity flight leg
+
+    Arguments:
+        line {Line} -- The path of the flight leg
+        start_time {float} -- Time the UAS begins the leg
+        speed {float} -- Speed of the UAS in meters per minute
+
+    Keyword Arguments:
+        exclusion_start {float} -- Distance at the start of the leg where collisions are ignored (default: {0})
+        exclusion_end {float} -- Distance at the end of the leg where collisions are ignored (default: {0})
+    """
+    duration = line.length / speed
+    row = np.empty(7)
+    row[SX] = line.start.x
+    row[SY] = line.start.y
+    row[VX] = line.vector[0] * speed if line.length > EPSILON else 0.0
+    row[VY] = line.vector[1] * speed if line.length > EPSILON else 0.0
+    row[T0] = start_time
+    row[E0] = start_time + min(exclusion_start / speed, duration)
+    row[E1] = start_time + max(duration - exclusion_end / speed, 0.0)
+    return row
+
+
+class ClosestApproach(object):
+    """Holds every active flight leg in a flight table and finds conflicts between them
+    """
+
+    def __init__(self, separation=SEPARATION_DISTANCE, capacity=64):
+        self.separation = separation
+        self.flights = np.zeros((capacity, 7))
+        self.uids = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.uids)
+
+    def add_flight(self, uid, line: Line, start_time, speed, exclusion_start=0, exclusion_end=0):
+        self.remove_flight(uid)
+        if len(self.uids) == self.flights.shape[0]:
+            self.flights = np.concatenate([self.flights, np.zeros_like(self.flights)])
+        self.flights[len(self.uids)] = flight_row(line, start_time, speed, exclusion_start, exclusion_end)
+        self.index[uid] = len(self.uids)
+        self.uids.append(uid)
+
+    def remove_flight(self, uid):
+        i = self.index.pop(uid, None)
+        if i is None:
+            return
+        # Swap the last flight into the removed row
+        last = len(self.uids) - 1
+        if i != last:
+            self.flights[i] = self.flights[last]
+            self.uids[i] = self.uids[last]
+            self.index[self.uids[i]] = i
+        self.uids.pop()
+
+    def position(self, uid, time):
+        row = self.flights[self.index[uid]]
+        return Point(row[SX] + row[VX] * (time - row[T0]), row[SY] + row[VY] * (time - row[T0]))
+
+    def segment(self, uid, time_start, time_end):
+        """Line the UAS flies along between two times"""
+        return Line(self.position(uid, time_start), self.position(uid, time_end))
+
+    def conflicts(self, flights, rows=None):
+        """Tests a batch of flights against every active flight in one array operation
+
+        Arguments:
+            flights {ndarray} -- (N, 7) flight table, see flight_row
+
+        Keyword Arguments:
+            rows {ndarray} -- Rows of the flight table to test against (default: {None, every active flight})
+
+        Returns:
+            list -- One list of Conflict per flight in the batch
+        """
+        if rows is None:
+            rows = np.arange(len(self.uids))
+        result = closest_approach(flights, self.flights[rows], self.separation)
+        conflicts = [[] for _ in range(len(flights))]
+        for i, j in zip(*np.nonzero(result['conflict'])):
+            conflicts[i].append(Conflict(self.uids[rows[j]], result['time'][i, j], result['distance'][i, j],
+                                         result['time_enter'][i, j], result['time_exit'][i, j]))
+        return conflicts
+
+    def check(self, uid, candidates=None):
+        """Finds every active flight that conflicts with the flight identified by uid
+
+        Keyword Arguments:
+            candidates {list} -- uids of the flights to test against (default: {None, every active flight})
+        """
+        rows = None
+        if candidates is not None:
+            rows = np.array(sorted(self.index[candidate] for candidate in candidates if candidate != uid), dtype=int)
+        row = self.flights[self.index[uid]][None, :]
+        return [conflict for conflict in self.conflicts(row, rows)[0] if conflict.uid != uid]
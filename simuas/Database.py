@@ -1,8 +1,12 @@
 """Holds Database
 """
 
+import json
 import random
 import sqlite3
+import logging
+
+from simuas.Util import Point, Line
 
 PACKAGE_DESTINATION_SEED = 10
 
@@ -12,45 +16,124 @@ RAND_PACKAGE.seed(PACKAGE_DESTINATION_SEED)
 DB_PATH = './data/uas_sim.sqlite'
 
 
+# Spatial metadata with only the spatial reference system of the paths, instead of thousands of SRS rows
+CREATE_SPATIAL_METADATA = """
+SELECT InitSpatialMetaData(1, 'NONE');
+SELECT InsertEpsgSrid(3857);
+"""
+
 CREATE_TABLE = """
-SELECT InitSpatialMetaData();
 CREATE TABLE paths  (
-  uid TEXT NOT NULL,
+  uid INTEGER NOT NULL,
   status TEXT);
 
 SELECT AddGeometryColumn('paths', 'geometry', 3857, 'LINESTRING', 'XY');
+SELECT CreateSpatialIndex('paths', 'geometry');
+CREATE UNIQUE INDEX idx_paths_uid ON paths(uid);
 """
 
 CREATE_TABLE_COLLISION = """
 CREATE TABLE paths_collision  (
-  a_uid TEXT NOT NULL,
-  b_uid TEXT NOT NULL);
+  a_uid INTEGER NOT NULL,
+  b_uid INTEGER NOT NULL,
+  run INTEGER);
 
 SELECT AddGeometryColumn('paths_collision', 'geometry', 3857, 'LINESTRING', 'XY');
 """
 
+# Append-only history of every leg, the paths table only holds the legs that are flown right now
+CREATE_TABLE_ARCHIVE = """
+CREATE TABLE paths_archive  (
+  uid INTEGER NOT NULL,
+  status TEXT,
+  start_time REAL,
+  run INTEGER);
+
+SELECT AddGeometryColumn('paths_archive', 'geometry', 3857, 'LINESTRING', 'XY');
+"""
+
+# Table (or the spatial metadata table) that is checked and the script that creates it
+SCHEMA = [
+    ('spatial_ref_sys', CREATE_SPATIAL_METADATA),
+    ('paths', CREATE_TABLE),
+    ('paths_collision', CREATE_TABLE_COLLISION),
+    ('paths_archive', CREATE_TABLE_ARCHIVE),
+]
+
+# Tables that keep rows of every run of a file database, the run column tells the runs apart
+RUN_TABLES = ['paths_collision', 'paths_archive']
+
+ADD_RUN_COLUMN = "ALTER TABLE {} ADD COLUMN run INTEGER"
+
+LAST_RUN = "SELECT MAX(run) FROM {}"
+
+# A file backed database is written through the write-ahead log, synced at checkpoints instead of every commit
+FILE_PRAGMAS = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+PRAGMA temp_store = MEMORY;
+PRAGMA cache_size = -65536;
+"""
+
 # LINE_STRING = "LINESTRING(:start_x :start_y, end_x end_y)"
 
 RADIUS_BUFFER = 5
 
+# Geometry is built from the coordinates directly, no WKT is formatted or parsed
+MAKE_LINE = "MakeLine(MakePoint(:start_x, :start_y, 3857), MakePoint(:end_x, :end_y, 3857))"
+
 ADD_PATH = """
 INSERT INTO paths(uid, status, geometry)
-VALUES(:uid, :status, GeomFromText(:wkt, 3857))
-"""
+VALUES(:uid, :status, {})
+""".format(MAKE_LINE)
 
 ADD_COLLISION = """
-INSERT INTO paths_collision(a_uid, b_uid, geometry)
-VALUES(:a_uid, :b_uid, GeomFromText(:wkt, 3857))
-"""
-
+INSERT INTO paths_collision(a_uid, b_uid, run, geometry)
+VALUES(:a_uid, :b_uid, :run, {})
+""".format(MAKE_LINE)
+
+ADD_ARCHIVE = """
+INSERT INTO paths_archive(uid, status, start_time, run, geometry)
+VALUES(:uid, :status, :start_time, :run, {})
+""".format(MAKE_LINE)
+
+UPDATE_PATH = """
+UPDATE paths SET status = :status, geometry = {}
+WHERE uid = :uid
+""".format(MAKE_LINE)
+
+# Returns the end points of the intersections as numbers. They are NULL if an intersection is not a single line.
+# Candidates come from the R*Tree of paths.geometry (MBR prefilter) and paths that lie completely inside the
+# bounding box are dropped before any intersection is computed. The buffer of path a is computed once, the
+# buffer of path b only for paths that intersect. "LIMIT -1 OFFSET 0" keeps sqlite from flattening the
+# subqueries, which would evaluate the geometry functions again for every reference to their columns.
+# :candidates is NULL or a JSON array of the only uids path a is tested against.
 INTERSECTION_PATH_SQL = """
-SELECT b.uid as path_b_uid, ST_AsText(ST_Intersection(Buffer(a.geometry, :radius), b.geometry)) AS b_geom, ST_AsText(ST_Intersection(Buffer(b.geometry, :radius), a.geometry)) as a_geom
-    FROM paths AS a,
-         paths AS b
-    WHERE a.uid = :path_a_uid
-    AND a.uid != b.uid
-    AND ST_Intersects(Buffer(a.geometry, :radius), b.geometry)
-    AND NOT MBRWithin(ST_Intersection(Buffer(a.geometry, :radius), b.geometry), BuildMbr(:bbox_x_min,:bbox_y_min,:bbox_x_max,:bbox_y_max))
+SELECT path_b_uid,
+    ST_X(ST_StartPoint(a_geom)) AS a_start_x, ST_Y(ST_StartPoint(a_geom)) AS a_start_y,
+    ST_X(ST_EndPoint(a_geom)) AS a_end_x, ST_Y(ST_EndPoint(a_geom)) AS a_end_y,
+    ST_X(ST_StartPoint(b_geom)) AS b_start_x, ST_Y(ST_StartPoint(b_geom)) AS b_start_y,
+    ST_X(ST_EndPoint(b_geom)) AS b_end_x, ST_Y(ST_EndPoint(b_geom)) AS b_end_y
+FROM (
+    SELECT path_b_uid, b_geom, ST_Intersection(Buffer(b_geometry, :radius), a_geometry) AS a_geom
+    FROM (
+        SELECT b.uid AS path_b_uid, b.geometry AS b_geometry, a.geometry AS a_geometry,
+            ST_Intersection(a.buffer, b.geometry) AS b_geom
+        FROM (SELECT uid, geometry, Buffer(geometry, :radius) AS buffer
+                FROM paths WHERE uid = :path_a_uid LIMIT -1 OFFSET 0) AS a,
+             paths AS b
+        WHERE b.ROWID IN (
+            SELECT ROWID FROM SpatialIndex
+            WHERE f_table_name = 'paths' AND f_geometry_column = 'geometry' AND search_frame = a.buffer)
+        AND b.uid != a.uid
+        AND (:candidates IS NULL OR b.uid IN (SELECT value FROM json_each(:candidates)))
+        AND NOT MBRWithin(b.geometry, BuildMbr(:bbox_x_min,:bbox_y_min,:bbox_x_max,:bbox_y_max))
+        LIMIT -1 OFFSET 0
+    )
+    WHERE b_geom IS NOT NULL
+    AND NOT MBRWithin(b_geom, BuildMbr(:bbox_x_min,:bbox_y_min,:bbox_x_max,:bbox_y_max))
+    LIMIT -1 OFFSET 0
+)
 """
 
 
@@ -67,66 +150,188 @@ REMOVE_PATH = "DELETE FROM paths WHERE uid = :uid"
 # """
 
 
+def line_params(line):
+    return {'start_x': line.start.x, 'start_y': line.start.y, 'end_x': line.end.x, 'end_y': line.end.y}
+
+
+def row_line(row, prefix):
+    """Creates a line from the end point columns of a row, None if the geometry was not a line"""
+    start_x = row[prefix + 'start_x']
+    if start_x is None:
+        return None
+    return Line(Point(start_x, row[prefix + 'start_y']), Point(row[prefix + 'end_x'], row[prefix + 'end_y']))
+
+
 def dict_factory(cursor, row):
     d = {}
     for idx, col in enumerate(cursor.description):
         d[col[0]] = row[idx]
     return d
 
-class Database(object):
-    def __init__(self, db_path=DB_PATH, use_row=True):
-        self.conn = sqlite3.connect(db_path, check_same_thread=True,)
-        self.conn.enable_load_extension(True)
-        self.conn.execute('SELECT load_extension("mod_spatialite")')
-        self.conn.row_factory = sqlite3.Row if use_row else dict_factory
 
+# Number of buffered rows that are written in one transaction
+FLUSH_SIZE = 1024
+
+# Number of compiled statements sqlite3 keeps, every statement is prepared once and reused
+CACHED_STATEMENTS = 32
+
+# Empty in-memory database with the spatial schema, built once per process
+_TEMPLATE = None
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, check_same_thread=True, cached_statements=CACHED_STATEMENTS)
+    conn.enable_load_extension(True)
+    conn.execute('SELECT load_extension("mod_spatialite")')
+    return conn
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute("PRAGMA table_info({})".format(table)).fetchall()]
+
+
+def create_schema(conn):
+    """Creates every table that is missing, a file from an older version gets only the new tables and columns"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+    for table, script in SCHEMA:
+        if table not in tables:
+            conn.executescript(script)
+    for table in RUN_TABLES:
+        if 'run' not in table_columns(conn, table):
+            conn.execute(ADD_RUN_COLUMN.format(table))
+    conn.commit()
+
+
+def template_connection():
+    """Returns the template database, creating the spatial metadata and tables the first time it is called"""
+    global _TEMPLATE
+    if _TEMPLATE is None:
+        conn = connect(':memory:')
+        create_schema(conn)
+        _TEMPLATE = conn
+    return _TEMPLATE
+
+
+class WriteBehindRecorder(object):
+    """Buffers rows of append-only tables and writes them with executemany, in one transaction per flush
+    The commit of a flush also commits the pending changes of the live paths table
+
+    Arguments:
+        conn {sqlite3.Connection} -- Connection the rows are written to
+
+    Keyword Arguments:
+        flush_size {int} -- Number of buffered rows that triggers a flush (default: {FLUSH_SIZE})
+    """
+
+    def __init__(self, conn, flush_size=FLUSH_SIZE):
+        self.conn = conn
+        self.flush_size = flush_size
+        # statement -> list of parameters, in the order the statements were first recorded
+        self.buffers = {}
+        self.pending = 0
+
+    def record(self, sql, params):
+        self.buffers.setdefault(sql, []).append(params)
+        self.pending += 1
+        if self.pending >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        # The connection context manager commits, or rolls back if a statement fails
+        with self.conn:
+            for sql, rows in self.buffers.items():
+                if rows:
+                    self.conn.executemany(sql, rows)
+                    rows.clear()
+        self.pending = 0
+
+
+class Database(object):
+    """Paths and collisions in a spatialite database
+
+    Keyword Arguments:
+        db_path {str} -- Database file, ':memory:' for an in-memory database (default: {DB_PATH})
+        use_row {bool} -- Return sqlite3.Row instead of dict rows (default: {True})
+        flush_size {int} -- Number of buffered rows that triggers a flush (default: {FLUSH_SIZE})
+        run {int} -- Run the archived legs and collisions are recorded under, None is the run after
+                     the last one in the file (default: {None})
+    """
+
+    def __init__(self, db_path=DB_PATH, use_row=True, flush_size=FLUSH_SIZE, run=None):
+        self.conn = connect(db_path)
         if db_path == ':memory:':
             self.create_in_memory_db()
-        
-        # self.conn.executescript(CREATE_TABLE_COLLISION)
-        # self.conn.commit()
+            self.run = 0 if run is None else run
+        else:
+            self.create_file_db()
+            self.run = self.next_run() if run is None else run
+        # The schema is checked with plain tuple rows
+        self.conn.row_factory = sqlite3.Row if use_row else dict_factory
+        self.recorder = WriteBehindRecorder(self.conn, flush_size)
+
+    def create_file_db(self):
+        """Tunes the connection for a file and creates the missing tables
+        Legs that were in flight when the last run stopped are removed, uids start at 0 in every run
+        """
+        self.conn.executescript(FILE_PRAGMAS)
+        create_schema(self.conn)
+        with self.conn:
+            self.conn.execute(CLEAR_PATHS.format('paths'))
+
+    def next_run(self):
+        last = [self.conn.execute(LAST_RUN.format(table)).fetchone()[0] for table in RUN_TABLES]
+        last = [run for run in last if run is not None]
+        return max(last) + 1 if last else 0
 
     def create_in_memory_db(self):
-        self.conn.executescript(CREATE_TABLE)
-
-        self.conn.executescript(CREATE_TABLE_COLLISION)
-        self.conn.commit()
+        """Copies the empty template database with the sqlite backup API, the tables start out empty"""
+        template_connection().backup(self.conn)
     
     
-    def get_path_intersection(self, path_uid, bbox):
+    def get_path_intersection(self, path_uid, bbox, candidates=None):
         sql = INTERSECTION_PATH_SQL
-        curs = self.conn.cursor()
-        res = curs.execute(sql, {'path_a_uid': path_uid, 'bbox_x_min': bbox[0], 'bbox_y_min': bbox[1], 'bbox_x_max': bbox[2], 'bbox_y_max': bbox[3], 'radius': RADIUS_BUFFER})
-        rows = res.fetchall()
-        curs.close()
-        return rows
-
-    def insert_path(self, uas, status='flight'):
-        sql = ADD_PATH
-        path_line = uas.path
-        query_params = {'uid': uas.uid, 'status': status, 'wkt': path_line.to_wkt()}
-        curs = self.conn.cursor()
-        curs.execute(sql, query_params)
-        # self.conn.commit()
-    def insert_collision(self, a_uid, a_wkt, b_uid, b_wkt):
-        sql = ADD_COLLISION
-        query_params = {'a_uid': a_uid, 'b_uid': b_uid, 'wkt': a_wkt}
-        curs = self.conn.cursor()
-        curs.execute(sql, query_params)
-
-        query_params = {'a_uid': a_uid, 'b_uid': b_uid, 'wkt': b_wkt}
-        curs.execute(sql, query_params)
-        self.conn.commit()
+        candidates = None if candidates is None else json.dumps(sorted(int(uid) for uid in candidates))
+        rows = self.conn.execute(sql, {'path_a_uid': path_uid, 'bbox_x_min': bbox[0], 'bbox_y_min': bbox[1], 'bbox_x_max': bbox[2], 'bbox_y_max': bbox[3], 'radius': RADIUS_BUFFER, 'candidates': candidates}).fetchall()
+        intersections = []
+        for row in rows:
+            a_geom = row_line(row, 'a_')
+            b_geom = row_line(row, 'b_')
+            if a_geom is None or b_geom is None:
+                # Only touching the buffer, not a line segment
+                logging.debug('Skipping degenerate intersection with path (%s)', row['path_b_uid'])
+                continue
+            intersections.append({'path_b_uid': row['path_b_uid'], 'a_geom': a_geom, 'b_geom': b_geom})
+        return intersections
+
+    def insert_path(self, uid, line, status='flight', start_time=None):
+        """Adds the path to the live paths table right away, its copy in the archive is buffered"""
+        query_params = dict(line_params(line), uid=uid, status=status)
+        self.conn.execute(ADD_PATH, query_params)
+        self.recorder.record(ADD_ARCHIVE, dict(query_params, start_time=start_time, run=self.run))
+
+    def update_path(self, uid, line, status='flight', start_time=None):
+        """Replaces the path of a UAS that is already in the paths table with a single UPDATE"""
+        query_params = dict(line_params(line), uid=uid, status=status)
+        self.conn.execute(UPDATE_PATH, query_params)
+        self.recorder.record(ADD_ARCHIVE, dict(query_params, start_time=start_time, run=self.run))
+
+    def insert_collision(self, a_uid, a_geom, b_uid, b_geom):
+        """Buffers the geometry of both UAS, nothing is read back during a replication"""
+        self.recorder.record(ADD_COLLISION, dict(line_params(a_geom), a_uid=a_uid, b_uid=b_uid, run=self.run))
+        self.recorder.record(ADD_COLLISION, dict(line_params(b_geom), a_uid=a_uid, b_uid=b_uid, run=self.run))
 
     def clear_paths(self, table='paths'):
+        # Buffered rows are written first, so they are cleared as well
+        self.recorder.flush()
         curs = self.conn.cursor()
         curs.execute(CLEAR_PATHS.format(table))
 
     def remove_path(self, uid):
-        curs = self.conn.cursor()
-        curs.execute(REMOVE_PATH, {'uid': uid})
-
-
-
+        self.conn.execute(REMOVE_PATH, {'uid': uid})
 
+    def flush(self):
+        self.recorder.flush()
 
+    def close(self):
+        self.recorder.flush()
+        self.conn.close()
@@ -0,0 +1,130 @@
+"""Holds the events of a package center (collisions, low batteries, charges) as columns of preallocated arrays
+Events are integer codes and UAS and batteries are integer ids, so the log is queried with array operations
+"""
+import numpy as np
+
+# Event codes, EVENT_TYPES[code] is the name of an event
+UAS_COLLISION = 0
+BATTERY_LOW = 1
+BATTERY_BEFORE_CHARGE = 2
+EVENT_TYPES = ['uas_collision', 'battery_low', 'battery_before_charge']
+
+# Marks an empty id, e.g. the UAS of a battery that is charged
+NONE = -1
+
+# Column name, type and empty value of every event attribute
+# uas -- the UAS of the event, other -- the other UAS of a collision or the battery of a battery event
+# value -- charge of the battery, NaN for a collision
+EVENT_COLUMNS = [
+    ('time', np.float64, np.nan),
+    ('event', np.int8, NONE),
+    ('uas', np.int64, NONE),
+    ('other', np.int64, NONE),
+    ('value', np.float64, np.nan),
+]
+
+# Decimals of the time that identify a collision, the same collision is reported once by each UAS
+COLLISION_DECIMALS = 2
+
+
+def event_mask(columns, event, start=None, end=None):
+    """Boolean mask of the events of a type, in the time interval [start, end)
+
+    Arguments:
+        columns {dict} -- Columns of an event log, see EventLog.columns
+        event {int} -- Event code
+    """
+    mask = columns['event'] == event
+    if start is not None:
+        mask &= columns['time'] >= start
+    if end is not None:
+        mask &= columns['time'] < end
+    return mask
+
+
+def count_events(columns, event, start=None, end=None):
+    return int(np.count_nonzero(event_mask(columns, event, start, end)))
+
+
+def select_events(columns, event, start=None, end=None):
+    """Columns of only the events of a type, in the time interval [start, end)"""
+    mask = event_mask(columns, event, start, end)
+    return {name: column[mask] for name, column in columns.items()}
+
+
+def collision_pairs(columns, start=None, end=None):
+    """Collisions as pairs of UAS ids, the lower id first
+
+    Returns:
+        tuple -- Arrays of time, lower and higher UAS id
+    """
+    collisions = select_events(columns, UAS_COLLISION, start, end)
+    return (collisions['time'], np.minimum(collisions['uas'], collisions['other']),
+            np.maximum(collisions['uas'], collisions['other']))
+
+
+class EventLog(object):
+    """Struct of arrays of events. Grows by doubling like PackageLedger
+
+    Keyword Arguments:
+        capacity {int} -- Number of events to preallocate (default: {256})
+    """
+
+    def __init__(self, capacity=256):
+        self.size = 0
+        self.capacity = max(int(capacity), 1)
+        for name, dtype, empty in EVENT_COLUMNS:
+            setattr(self, name, np.full(self.capacity, empty, dtype=dtype))
+        # (lower uas, higher uas, rounded time) of every collision that was recorded
+        self._collisions = set()
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        for name, dtype, empty in EVENT_COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.full(self.capacity, empty, dtype=dtype)]))
+        self.capacity *= 2
+
+    def add(self, time, event, uas=NONE, other=NONE, value=np.nan):
+        """Records an event and returns its index"""
+        if self.size == self.capacity:
+            self._grow()
+        index = self.size
+        self.time[index] = time
+        self.event[index] = event
+        self.uas[index] = uas
+        self.other[index] = other
+        self.value[index] = value
+        self.size += 1
+        return index
+
+    def collision(self, time, uas_a, uas_b):
+        """Records a collision of two UAS, unless it was already reported by the other UAS
+
+        Returns:
+            bool -- True if the collision is new
+        """
+        key = (min(uas_a, uas_b), max(uas_a, uas_b), round(time, COLLISION_DECIMALS))
+        if key in self._collisions:
+            return False
+        self._collisions.add(key)
+        self.add(time, UAS_COLLISION, uas_a, uas_b)
+        return True
+
+    def battery_low(self, time, uas, battery, charge):
+        self.add(time, BATTERY_LOW, uas, battery, charge)
+
+    def battery_before_charge(self, time, battery, charge):
+        self.add(time, BATTERY_BEFORE_CHARGE, NONE, battery, charge)
+
+    def columns(self):
+        """Returns a view of every column, trimmed to the number of events"""
+        return {name: getattr(self, name)[:self.size] for name, _, _ in EVENT_COLUMNS}
+
+    def count(self, event, start=None, end=None):
+        return count_events(self.columns(), event, start, end)
+
+    def select(self, event, start=None, end=None):
+        return select_events(self.columns(), event, start, end)
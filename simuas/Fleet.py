@@ -0,0 +1,147 @@
+"""Registry of every UAS and battery of a replication
+UAS and batteries are referred to by integer ids, their attributes are columns of arrays
+so the whole fleet can be read at once
+"""
+from collections import defaultdict
+
+import numpy as np
+
+from simuas.Util import Line
+
+# States of a UAS
+WAIT_PACKAGE = 0
+FLIGHT_PACKAGE = 1
+FLIGHT_HOME = 2
+WAIT_BATTERY = 3
+UAS_STATES = ['wait_package', 'flight_package', 'flight_home', 'wait_battery']
+
+# States of a battery
+IN_BANK = 0
+INSTALLED = 1
+CHARGING = 2
+BATTERY_STATES = ['in_bank', 'installed', 'charging']
+
+# Marks an empty reference, e.g. a UAS without a battery
+NONE = -1
+
+UAS_COLUMNS = [
+    ('uas_center', np.int64, 0),
+    ('uas_state', np.int8, WAIT_PACKAGE),
+    ('uas_battery', np.int64, NONE),
+    ('uas_package', np.int64, NONE),
+    ('uas_speed', np.float64, 0.0),
+    ('start_x', np.float64, np.nan),
+    ('start_y', np.float64, np.nan),
+    ('end_x', np.float64, np.nan),
+    ('end_y', np.float64, np.nan),
+    ('path_start_time', np.float64, np.nan),
+]
+
+BATTERY_COLUMNS = [
+    ('battery_center', np.int64, 0),
+    ('battery_state', np.int8, IN_BANK),
+    ('charge', np.float64, 0.0),
+]
+
+
+class Fleet(object):
+    """Struct of arrays of every UAS and battery. Grows by doubling like PackageLedger
+
+    Keyword Arguments:
+        uas_capacity {int} -- Number of UAS to preallocate (default: {64})
+        battery_capacity {int} -- Number of batteries to preallocate (default: {256})
+    """
+
+    def __init__(self, uas_capacity=64, battery_capacity=256):
+        self.uas_capacity = max(int(uas_capacity), 1)
+        self.battery_capacity = max(int(battery_capacity), 1)
+        self.n_uas = 0
+        self.n_batteries = 0
+        for name, dtype, fill in UAS_COLUMNS:
+            setattr(self, name, np.full(self.uas_capacity, fill, dtype=dtype))
+        for name, dtype, fill in BATTERY_COLUMNS:
+            setattr(self, name, np.full(self.battery_capacity, fill, dtype=dtype))
+        # Current path of every UAS as a Line, the geometry the collision backends work with
+        self.paths = []
+        # (center uid, battery state) -> number of batteries
+        self.inventory = defaultdict(int)
+
+    def _grow(self, columns, size):
+        for name, dtype, fill in columns:
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.full(size, fill, dtype=dtype)]))
+
+    def add_uas(self, center_uid, speed, battery=NONE):
+        """Adds a UAS to the fleet and returns its id
+
+        Arguments:
+            center_uid {int} -- Package center of the UAS
+            speed {float} -- Speed of the UAS in meters per minute
+        """
+        if self.n_uas == len(self.uas_center):
+            self._grow(UAS_COLUMNS, len(self.uas_center))
+        uas = self.n_uas
+        self.uas_center[uas] = center_uid
+        self.uas_state[uas] = WAIT_PACKAGE
+        self.uas_speed[uas] = speed
+        self.paths.append(None)
+        self.n_uas += 1
+        if battery != NONE:
+            self.install_battery(uas, battery)
+        return uas
+
+    def add_battery(self, center_uid, charge=100):
+        """Adds a battery to the battery bank of a package center and returns its id"""
+        if self.n_batteries == len(self.battery_center):
+            self._grow(BATTERY_COLUMNS, len(self.battery_center))
+        battery = self.n_batteries
+        self.battery_center[battery] = center_uid
+        self.battery_state[battery] = IN_BANK
+        self.charge[battery] = charge
+        self.inventory[(center_uid, IN_BANK)] += 1
+        self.n_batteries += 1
+        return battery
+
+    def set_battery_state(self, battery, state):
+        center_uid = int(self.battery_center[battery])
+        self.inventory[(center_uid, int(self.battery_state[battery]))] -= 1
+        self.inventory[(center_uid, state)] += 1
+        self.battery_state[battery] = state
+
+    def install_battery(self, uas, battery):
+        self.uas_battery[uas] = battery
+        self.set_battery_state(battery, INSTALLED)
+
+    def remove_battery(self, uas):
+        """Takes the battery out of the UAS and returns its id"""
+        battery = int(self.uas_battery[uas])
+        self.uas_battery[uas] = NONE
+        return battery
+
+    def battery_count(self, center_uid, state=IN_BANK):
+        """Number of batteries of a package center in a state, O(1)"""
+        return self.inventory[(center_uid, state)]
+
+    def battery_charge(self, uas):
+        return float(self.charge[self.uas_battery[uas]])
+
+    def deplete(self, uas, amount):
+        self.charge[self.uas_battery[uas]] -= amount
+
+    def set_path(self, uas, line: Line, start_time, state):
+        """Starts a new leg of the UAS"""
+        self.paths[uas] = line
+        self.start_x[uas], self.start_y[uas] = line.start.x, line.start.y
+        self.end_x[uas], self.end_y[uas] = line.end.x, line.end.y
+        self.path_start_time[uas] = start_time
+        self.uas_state[uas] = state
+
+    def clear_path(self, uas, state=WAIT_BATTERY):
+        self.paths[uas] = None
+        self.start_x[uas] = self.start_y[uas] = self.end_x[uas] = self.end_y[uas] = np.nan
+        self.path_start_time[uas] = np.nan
+        self.uas_state[uas] = state
+
+    def path(self, uas):
+        return self.paths[uas]
+
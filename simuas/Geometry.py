@@ -0,0 +1,115 @@
+"""Points and straight line segments
+Single points and lines are plain python objects, arrays of segments are handled by the batch functions.
+A segment array is four columns: start x, start y, end x and end y.
+"""
+import math
+import re
+
+import numpy as np
+
+LINE_STRING = "LINESTRING({} {}, {} {})"
+
+# Lines shorter than this (meters) keep their direction vector as is, it is not normalized
+MIN_LENGTH = .0001
+
+
+class Point(object):
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __eq__(self, other):
+        return isinstance(other, Point) and self.x == other.x and self.y == other.y
+
+    def __repr__(self):
+        return "Point(x={}, y={})".format(self.x, self.y)
+
+
+def distance(a: Point, b: Point):
+    return math.hypot(b.x - a.x, b.y - a.y)
+
+
+class Line(object):
+    __slots__ = ('start', 'end', 'vector', 'length')
+
+    def __init__(self, start: Point, end: Point):
+        self.start = start
+        self.end = end
+        dx, dy = end.x - start.x, end.y - start.y
+        self.length = math.hypot(dx, dy)
+        # If we have the zero vector then we dont need to normalize
+        if self.length > MIN_LENGTH:
+            self.vector = (dx / self.length, dy / self.length)
+        else:
+            self.vector = (dx, dy)
+
+    def along(self, distance):
+        return Point(self.start.x + self.vector[0] * distance, self.start.y + self.vector[1] * distance)
+
+    def to_wkt(self):
+        return LINE_STRING.format(self.start.x, self.start.y, self.end.x, self.end.y)
+
+    def __repr__(self):
+        return "({:.1f}, {:.1f}) -> ({:.1f}, {:.1f})".format(self.start.x, self.start.y, self.end.x, self.end.y)
+
+    @staticmethod
+    def from_wkt(wkt):
+        numbers = re.findall(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?", wkt)
+        if len(numbers) == 4:
+            return Line(Point(float(numbers[0]), float(numbers[1])), Point(float(numbers[2]), float(numbers[3])))
+        else:
+            return None
+
+
+def segments(lines):
+    """Creates the start x, start y, end x and end y columns of a list of lines"""
+    columns = np.array([(line.start.x, line.start.y, line.end.x, line.end.y) for line in lines], dtype=float)
+    return tuple(columns.reshape(-1, 4).T)
+
+
+def point_segment_distances(px, py, start_x, start_y, end_x, end_y):
+    """Distance of every point to the closest point of a segment"""
+    dx, dy = end_x - start_x, end_y - start_y
+    squared = dx * dx + dy * dy
+    t = ((px - start_x) * dx + (py - start_y) * dy) / np.where(squared > 0, squared, 1.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - (start_x + t * dx), py - (start_y + t * dy))
+
+
+def segment_distances(a, b):
+    """Minimum distance between every pair of segments in a and b, zero for segments that cross
+
+    Arguments:
+        a {tuple} -- Start x, start y, end x and end y columns of the first segments
+        b {tuple} -- Columns of the second segments, broadcast against a
+
+    Returns:
+        ndarray -- The distance of every pair
+    """
+    a = [np.asarray(column, dtype=float) for column in a]
+    b = [np.asarray(column, dtype=float) for column in b]
+    # Segments that do not cross are closest at an end point of one of them
+    result = np.minimum.reduce([
+        point_segment_distances(a[0], a[1], *b),
+        point_segment_distances(a[2], a[3], *b),
+        point_segment_distances(b[0], b[1], *a),
+        point_segment_distances(b[2], b[3], *a),
+    ])
+    # The end points of each segment are on opposite sides of the other segment
+    side_a0 = _cross(b, a[0], a[1])
+    side_a1 = _cross(b, a[2], a[3])
+    side_b0 = _cross(a, b[0], b[1])
+    side_b1 = _cross(a, b[2], b[3])
+    crosses = (side_a0 * side_a1 < 0) & (side_b0 * side_b1 < 0)
+    return np.where(crosses, 0.0, result)
+
+
+def _cross(segment, px, py):
+    """Which side of the segment each point is on, the sign of the cross product"""
+    return (segment[2] - segment[0]) * (py - segment[1]) - (segment[3] - segment[1]) * (px - segment[0])
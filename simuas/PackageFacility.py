@@ -2,69 +2,56 @@
 """
 import sys
 import logging
-from uuid import uuid4
 import random
 import numpy as np
 from pprint import pprint as pp
 import simpy
-from simuas.helper import MonitoredStore, QueueCount, condense
+from simuas.helper import MonitoredStore, QueueCount, ChargingStations, condense
+from simuas.RandomStreams import RandomStreams
+from simuas.Statistics import TimeWeightedStats, ObservationStats, BATCH_LENGTH
 
 
-from simuas.Util import Package, Battery, Uas, UasState, Point, Line, get_package_destination, get_package_weight, BAT_TO_DIST
-
-DEMAND_SEED = 1
-BATTERY_SERVICE_SEED = 100
-PACKAGE_DESTINATION_SEED = 10
-PACKAGE_WEIGHT_SEED = 12
+from simuas.PackageLedger import PackageLedger
+from simuas.EventLog import EventLog, UAS_COLLISION
+from simuas.Fleet import IN_BANK, CHARGING, FLIGHT_PACKAGE, FLIGHT_HOME, WAIT_BATTERY
+from simuas.Util import Point, Line, get_package_weights, BAT_TO_DIST
+from simuas.Geometry import distance
 
 # Conversion from meters/sec to meters/min
 MS_TO_MM = 60
 
 
-# This holds our random number generators
-# Needed when we do replications and dont want to reset the seed
-# on the next replication
-RANDOM_GENERATORS = {}
-
 MAX_SIM_TIME = 12 * 60
 
 # RADIUS around package center which no collision can happen
 BBOX_PACKAGE_CENTER = 100
 
+# Number of packages whose arrival, destination and weight are drawn at a time
+DEMAND_CHUNK_SIZE = 1024
 
-UAS_SET = {}
-
-
-def get_random_gen(seed):
-    generator = RANDOM_GENERATORS.get(seed)
-    if generator is None:
-        generator = np.random.RandomState()
-        generator.seed(seed)
-        RANDOM_GENERATORS[seed] = generator
-    return generator
-
-
-def create_info(time, info_type, value, other='', other2=''):
-    return {'time': time, 'info_type': info_type, 'value': value, 'other': other, 'other2': other2}
+# Time (minutes) before which no statistic of the summary is recorded
+WARM_UP_TIME = 0
 
-
-def uid_time_hash(uid_a, uid_b, time):
-    if uid_a < uid_b:
-        return '{};{};{:.2f}'.format(uid_a, uid_b, time)
-    else:
-        return '{};{};{:.2f}'.format(uid_b, uid_a, time)
+# Settings that PackageFacility.apply can change by assignment
+APPLICABLE_SETTINGS = ['lambda_demand', 'mu_battery', 'radial_bounds', 'replacement_time', 'safety_battery_level',
+                       'demand_stop_time']
 
 
 class PackageFacility(object):
-    def __init__(self, env, uid, db, radial_bounds, center, lambda_demand=1, mu_battery=80, battery_capacity=100, uas_capacity=15, uas_speed=7.5, replacement_time=1, safety_battery_level=20, demand_stop_time=MAX_SIM_TIME):
+    def __init__(self, env, uid, airspace, radial_bounds, center, lambda_demand=1, mu_battery=80, battery_capacity=100, uas_capacity=15, uas_speed=7.5, replacement_time=1, safety_battery_level=20, demand_stop_time=MAX_SIM_TIME, streams=None, warm_up=WARM_UP_TIME, batch_length=BATCH_LENGTH):
         self.env = env      # global simulation environment
         self.uid = uid      # unique identifying number of package facility
+        # random streams of the replication
+        self.streams = streams if streams is not None else RandomStreams()
         self.radial_bounds = radial_bounds
         # the center location of this package facility
         self.center = Point(center[0], center[1])
         self.bbox_center = [self.center.x - BBOX_PACKAGE_CENTER, self.center.y - BBOX_PACKAGE_CENTER,
                             self.center.x + BBOX_PACKAGE_CENTER, self.center.y + BBOX_PACKAGE_CENTER]
-        self.db = db        # database connection
+        # shared airspace of every package center, owns the fleet and the flight legs
+        self.airspace = airspace
+        self.fleet = airspace.fleet
+        self.db = airspace.index        # collision backend
         self.lambda_demand = lambda_demand  # mean of demand
         self.mu_battery = mu_battery       # mean of battery service
         self.battery_capacity = battery_capacity
@@ -78,60 +65,102 @@ class PackageFacility(object):
         self.uas_bank = MonitoredStore(env)
         # Queue Length stats
         self.uas_queue = QueueCount(self.env)
-        self.charging_stations = QueueCount(self.env)
-        # A list to hold all packages created, might not be necessary
-        self.packages = []
+        self.charging_stations = ChargingStations(self.env, self.battery_charged)
+        # Columns of every package created, preallocated for the expected demand
+        self.packages = PackageLedger(1.25 * lambda_demand * demand_stop_time + 64)
+        # Online statistics after the warm-up, for compact summaries of a replication
+        self.warm_up = warm_up
+        for queue in self.queues().values():
+            queue.attach_stats(TimeWeightedStats(warm_up, batch_length, env.now))
+        self.total_wait_stats = ObservationStats()
+        self.uas_wait_stats = ObservationStats()
 
         # initialize our resources
+        airspace.add_facility(self)
         self.init_battery()
-        self.uas_set = UAS_SET
         env.process(self.init_uas())
 
         # Create independent random streams
-        self.demand_rand = get_random_gen(DEMAND_SEED * self.uid)
-        self.destination_rand = get_random_gen(
-            PACKAGE_DESTINATION_SEED * self.uid)
-        # Holds any info we wish to record (collisions, low battery)
-        self.info = []
-        # self.info = []s
+        self.demand_rand = self.streams.generator(self.uid, 'demand')
+        self.destination_rand = self.streams.generator(self.uid, 'destination')
+        self.weight_rand = self.streams.generator(self.uid, 'weight')
+        # Holds any events we wish to record (collisions, low battery)
+        self.events = EventLog()
 
         env.process(self.demand_source())
         env.process(self.report_stats())
 
-    def data_package(self):
+    def queues(self):
         return {
-            'charging_stations': condense(self.charging_stations),
-            'uas_queue': condense(self.uas_queue),
-            'battery_bank': condense(self.battery_bank),
-            'uas_bank': condense(self.uas_bank),
-            'packages': self.packages,
-            'info': self.info,
+            'charging_stations': self.charging_stations,
+            'uas_queue': self.uas_queue,
+            'battery_bank': self.battery_bank,
+            'uas_bank': self.uas_bank,
         }
 
+    def data_package(self):
+        data = {name: condense(queue) for name, queue in self.queues().items()}
+        data['packages'] = self.packages.columns()
+        data['info'] = self.events.columns()
+        return data
+
+    def summary(self):
+        """Compact statistics of the replication after the warm-up, instead of the full traces of data_package"""
+        summary = {name: queue.stats.summary(self.env.now) for name, queue in self.queues().items()}
+        summary['total_wait'] = self.total_wait_stats.summary()
+        summary['uas_wait'] = self.uas_wait_stats.summary()
+        summary['collisions'] = self.events.count(UAS_COLLISION, start=self.warm_up)
+        return summary
+
     def report_stats(self, interval=10):
         yield self.env.timeout(interval)
         while self.env.now < self.demand_stop_time:
             avg_battery_bank_level = self.battery_bank.avg_value
             avg_uas_bank_level = self.uas_bank.avg_value
-            logging.info('Sim Time: %.2f. Avg Stats - Battery bank level: %.1f, UAS bank level: %.1f',
-                         self.env.now, avg_battery_bank_level, avg_uas_bank_level)
+            logging.info('Sim Time: %.2f. Avg Stats - Battery bank level: %.1f, UAS bank level: %.1f. Batteries charging: %d',
+                         self.env.now, avg_battery_bank_level, avg_uas_bank_level,
+                         self.fleet.battery_count(self.uid, CHARGING))
             # self.battery_bank.print_stats()
             # self.uas_bank.print_stats()
             yield self.env.timeout(interval)
 
-    def init_uas(self):
-        for i in range(self.uas_capacity):
+    def init_uas(self, count=None):
+        count = self.uas_capacity if count is None else count
+        for i in range(count):
             battery_req = self.battery_bank.get()
             battery = yield battery_req
-            uas = Uas(uuid4().hex, self.uid, UasState.wait_package, battery)
-            self.uas_set[uas.uid] = uas
+            uas = self.fleet.add_uas(self.uid, self.uas_speed * MS_TO_MM, battery)
             self.uas_bank.put(uas)
 
-    def init_battery(self):
-        for i in range(self.battery_capacity):
-            battery = Battery(uuid4().hex, self.uid, 100)
+    def init_battery(self, count=None):
+        count = self.battery_capacity if count is None else count
+        for i in range(count):
+            battery = self.fleet.add_battery(self.uid, 100)
             self.battery_bank.put(battery)
 
+    def apply(self, **settings):
+        """Changes the settings of a running package center, e.g. a variant forked from a warm start
+        Capacities can only grow, the new batteries and UAS are added to the banks
+
+        Keyword Arguments:
+            settings -- Any keyword argument of the constructor except the center
+        """
+        for name, value in settings.items():
+            if name == 'battery_capacity':
+                if value < self.battery_capacity:
+                    raise ValueError('Battery capacity can not shrink from {} to {}'.format(self.battery_capacity, value))
+                self.init_battery(value - self.battery_capacity)
+            elif name == 'uas_capacity':
+                if value < self.uas_capacity:
+                    raise ValueError('UAS capacity can not shrink from {} to {}'.format(self.uas_capacity, value))
+                self.env.process(self.init_uas(value - self.uas_capacity))
+            elif name == 'uas_speed':
+                fleet = self.fleet
+                fleet.uas_speed[:fleet.n_uas][fleet.uas_center[:fleet.n_uas] == self.uid] = value * MS_TO_MM
+            elif name not in APPLICABLE_SETTINGS:
+                raise ValueError('{} can not be changed while running'.format(name))
+            setattr(self, name, value)
+
     # def createPath(self, uas, package):
     #     path = Line(self.center, )
     #     uas.package = package
@@ -140,39 +169,49 @@ class PackageFacility(object):
         # Request a fully charged battery from the battery bank, wait for it
         with self.battery_bank.get() as battery_req:
             logging.debug(
-                'Sim Time: %.2f. Requesting replacement battery for UAS (%s)', self.env.now, uas.uid)
+                'Sim Time: %.2f. Requesting replacement battery for UAS (%d)', self.env.now, uas)
             battery = yield battery_req
-            uas.battery = battery
-            uas.path = None
-            uas.state = 'waiting'
+            self.fleet.install_battery(uas, battery)
+            self.fleet.clear_path(uas, WAIT_BATTERY)
 
             # Deterministic Replacement Time
             yield self.env.timeout(self.replacement_time)
 
             logging.debug(
-                'Sim Time: %.2f. Received replacement battery (%s) for UAS (%s) ', self.env.now, battery.uid, uas.uid)
+                'Sim Time: %.2f. Received replacement battery (%d) for UAS (%d) ', self.env.now, battery, uas)
             self.uas_bank.put(uas)
 
-    def charge_battery(self, battery: Battery):
-        # Assume infinite charging stations, use the queue to keep track of how many are used at any given time
-        self.info.append(create_info(
-            self.env.now, 'battery_before_charge', battery.charge))
-        time_to_charge = (100-battery.charge) / 100 * self.mu_battery
+    def charge_battery(self, battery):
+        # Assume infinite charging stations, they keep track of how many are used at any given time
+        fleet = self.fleet
+        charge = float(fleet.charge[battery])
+        self.events.battery_before_charge(self.env.now, battery, charge)
+        time_to_charge = (100-charge) / 100 * self.mu_battery
         logging.debug(
-            'Sim Time: %.2f. Beggining to charge battery (%s). From %.1f%% to 100%%. %.1f mins', self.env.now, battery.uid, battery.charge, time_to_charge)
+            'Sim Time: %.2f. Beggining to charge battery (%d). From %.1f%% to 100%%. %.1f mins', self.env.now, battery, charge, time_to_charge)
 
-        self.charging_stations.add()
-        yield self.env.timeout(time_to_charge)
-        self.charging_stations.remove()
+        fleet.set_battery_state(battery, CHARGING)
+        self.charging_stations.charge(battery, time_to_charge)
 
-        battery.charge = 100
+    def battery_charged(self, battery):
+        """Puts a battery back into the battery bank once it is done charging"""
+        self.fleet.charge[battery] = 100
+        self.fleet.set_battery_state(battery, IN_BANK)
         self.battery_bank.put(battery)
 
     def replace_battery_and_recharge(self, uas):
-        self.env.process(self.charge_battery(uas.battery))
+        self.charge_battery(self.fleet.remove_battery(uas))
         self.env.process(self.replace_battery(uas))
 
     def handle_package(self, package):
+        """Process that delivers a package
+
+        Arguments:
+            package {int} -- Handle of the package in the package ledger
+        """
+        packages = self.packages
+        fleet = self.fleet
+        destination = Point(float(packages.dest_x[package]), float(packages.dest_y[package]))
         # Request a UAS that is fully charged
         with self.uas_bank.get() as uas_req:
             before_uas_time = self.env.now
@@ -181,43 +220,42 @@ class PackageFacility(object):
             self.uas_queue.remove()         # decrement uas queue
 
             logging.debug(
-                'Sim Time: %.2f. UAS (%s) ready for delivery of package (%s)', self.env.now, uas.uid, package.uid)
-
-            package.start_time = self.env.now
-            package.uas_wait = self.env.now - before_uas_time
-            uas.package = package
-            uas.path = Line(self.center, package.destination)
-            uas.path_start_time = self.env.now
-            uas.state = 'flight_package'
+                'Sim Time: %.2f. UAS (%d) ready for delivery of package (%d)', self.env.now, uas, package)
+
+            packages.start_time[package] = self.env.now
+            packages.uas_wait[package] = self.env.now - before_uas_time
+            fleet.uas_package[uas] = package
+            path = Line(self.center, destination)
+            fleet.set_path(uas, path, self.env.now, FLIGHT_PACKAGE)
             # extra data
-            package.travel_dist = uas.path.length
-            self.db.insert_path(uas, self.uid)
+            packages.travel_dist[package] = path.length
+            self.airspace.start_leg(uas, BBOX_PACKAGE_CENTER)
 
             # Check Collision
             self.check_collision(uas)
 
             # Wait for arrival at package destination
-            eta = uas.path.length / (self.uas_speed * MS_TO_MM)
+            eta = path.length / (self.uas_speed * MS_TO_MM)
             yield self.env.timeout(eta)
 
             logging.debug(
-                'Sim Time: %.2f. UAS (%s) delivered package. Going home', self.env.now, uas.uid)
+                'Sim Time: %.2f. UAS (%d) delivered package. Going home', self.env.now, uas)
 
             # We have successfully arrived at our destination!
             # Deplete the battery
-            uas.battery.charge -= uas.path.length * \
-                BAT_TO_DIST[package.weight]
+            fleet.deplete(uas, path.length * BAT_TO_DIST[packages.weight[package]])
 
             # Deliver Package
-            package.delivery_wait = self.env.now - uas.path_start_time
-            package.total_wait = self.env.now - package.creation_time
-            uas.package = None
+            packages.delivery_wait[package] = self.env.now - fleet.path_start_time[uas]
+            packages.total_wait[package] = self.env.now - packages.creation_time[package]
+            if packages.creation_time[package] >= self.warm_up:
+                self.total_wait_stats.add(float(packages.total_wait[package]))
+                self.uas_wait_stats.add(float(packages.uas_wait[package]))
+            fleet.uas_package[uas] = -1
             # Plan to next destination (back to home), remove old path
-            uas.path = Line(package.destination, self.center)
-            uas.path_start_time = self.env.now
-            uas.state = 'flight_home'
-            self.db.remove_path(uas.uid)
-            self.db.insert_path(uas, self.uid)
+            path = Line(destination, self.center)
+            fleet.set_path(uas, path, self.env.now, FLIGHT_HOME)
+            self.airspace.change_leg(uas, BBOX_PACKAGE_CENTER)
 
             # Check Collision
             self.check_collision(uas)
@@ -227,53 +265,66 @@ class PackageFacility(object):
 
             # We have successfully arrived at package center
             # Deplete the battery, no load
-            uas.battery.charge -= uas.path.length * \
-                BAT_TO_DIST[0]
+            fleet.deplete(uas, path.length * BAT_TO_DIST[0])
             # Remove old path
-            self.db.remove_path(uas.uid)
+            self.airspace.end_leg(uas)
 
-            if(uas.battery.charge < self.safety_battery_level):
-                logging.error('Sim Time: %.2f. UAS (%s) battery (%s) below safety level! Level %.1f',
-                              self.env.now, uas.uid, uas.battery.uid, uas.battery.charge)
-                self.info.append(create_info(
-                    self.env.now, 'battery_low', uas.uid, uas.battery.charge))
+            charge = fleet.battery_charge(uas)
+            if(charge < self.safety_battery_level):
+                logging.error('Sim Time: %.2f. UAS (%d) battery (%d) below safety level! Level %.1f',
+                              self.env.now, uas, fleet.uas_battery[uas], charge)
+                self.events.battery_low(self.env.now, uas, int(fleet.uas_battery[uas]), charge)
 
             logging.debug(
-                'Sim Time: %.2f. UAS (%s) delivered package (%s). Now at package center with battery %.1f', self.env.now, uas.uid, package.uid, uas.battery.charge)
+                'Sim Time: %.2f. UAS (%d) delivered package (%d). Now at package center with battery %.1f', self.env.now, uas, package, charge)
 
             # Replace battery and recharge
             self.replace_battery_and_recharge(uas)
 
     def check_collision(self, uas):
-        path_intersections = self.db.get_path_intersection(
-            uas.uid, self.bbox_center)
+        if self.airspace.conflict_engine is not None:
+            self.check_closest_approach(uas)
+            return
+        path_intersections = self.airspace.path_intersections(
+            uas, self.bbox_center)
         if len(path_intersections) > 0:
             for path in path_intersections:
                 result, averaged_time_stamp = self.check_path_time_collision(
                     uas, path)
                 if result:
                     # self.db.conn.commit()
-                    logging.error('Sim Time: %.2f. UAS (%s) collides with UAS (%s)!',
-                                  self.env.now, uas.uid, path['path_b_uid'])
-                    uid_hash = uid_time_hash(
-                        uas.uid, path['path_b_uid'],  averaged_time_stamp)
-                    self.info.append(create_info(
-                        averaged_time_stamp, 'uas_collision', uas.uid, path['path_b_uid'], other2=uid_hash))
+                    logging.error('Sim Time: %.2f. UAS (%d) collides with UAS (%d)!',
+                                  self.env.now, uas, path['path_b_uid'])
+                    # the other UAS may have reported the same collision already
+                    self.events.collision(averaged_time_stamp, uas, path['path_b_uid'])
+
+    def check_closest_approach(self, uas):
+        """Check for collisions by solving for the closest approach of the UAS to every other active UAS
+        A collision is when two UAS are closer than the separation distance at the same time
+        Arguments:
+            uas {int} -- Id of the UAS that just planned a path
+        """
+        for conflict, a_geom, b_geom in self.airspace.conflicts(uas):
+            logging.error('Sim Time: %.2f. UAS (%d) collides with UAS (%d)! Conflict from %.2f to %.2f',
+                          self.env.now, uas, conflict.uid, conflict.time_enter, conflict.time_exit)
+            self.events.collision(float(conflict.time), uas, conflict.uid)
+            # Record where each UAS is during the conflict window
+            self.db.insert_collision(uas, a_geom, conflict.uid, b_geom)
 
     def check_path_time_collision(self, uas, path):
         """Check for a possible collision with a UAS and the *possible* collision from the path variable
         A collision is when two UAS are near eachother in SPACE and TIME
         Arguments:
-            uas {[UAS]} -- The UAS that just planned a path
-            path {path_result} -- This is a result from a SQL query that says two lines (paths) intersect around a buffered radius
+            uas {int} -- Id of the UAS that just planned a path
+            path {path_result} -- This is a result from the collision backend that says two lines (paths) intersect around a buffered radius
         """
         uas_a = uas
-        uas_b = self.uas_set[path['path_b_uid']]  # possibel offending UAS
+        uas_b = path['path_b_uid']  # possibel offending UAS
 
         # SPACE
         # These are sub lines of the respective uas paths that could have a collision
-        uas_a_intersection = Line.from_wkt(path['a_geom'])
-        uas_b_intersection = Line.from_wkt(path['b_geom'])
+        uas_a_intersection = path['a_geom']
+        uas_b_intersection = path['b_geom']
         # TIME
         # Determine at what time interval the UAS will be at these sections of possible collisions
         interval_a = self.time_bounds(uas_a, uas_a_intersection)
@@ -285,55 +336,70 @@ class PackageFacility(object):
         if collision:
 
             self.db.insert_collision(
-                uas_a.uid, path['a_geom'], path['path_b_uid'], path['b_geom'])
+                uas_a, path['a_geom'], uas_b, path['b_geom'])
 
         return collision, averaged_time_stamp
 
     def time_bounds(self, uas, uas_intersection):
-        # Get the beggining and ending lines
-        l1 = Line(uas.path.start, uas_intersection.start)
-        l2 = Line(uas.path.start, uas_intersection.end)
-        if uas.state == 'flight_package':
+        fleet = self.fleet
+        path = fleet.path(uas)
+        # the UAS may belong to another package center, with its own speed
+        speed = fleet.uas_speed[uas]
+        path_start_time = fleet.path_start_time[uas]
+        # Distance from the beggining of the path to the start and end of the intersection
+        l1_length = distance(path.start, uas_intersection.start)
+        l2_length = distance(path.start, uas_intersection.end)
+        if fleet.uas_state[uas] == FLIGHT_PACKAGE:
             # We are flying torwards the package
             # distance to travel to get to the collision interval
-            l1_dist = max(l1.length, BBOX_PACKAGE_CENTER)
-            l2_dist = l2.length
+            l1_dist = max(l1_length, BBOX_PACKAGE_CENTER)
+            l2_dist = l2_length
 
         else:
             # we are flying home
             # distance to travel to get to the collision interval
-            l1_dist = l1.length
-            l2_dist = min(l2.length, uas.path.length - BBOX_PACKAGE_CENTER)
+            l1_dist = l1_length
+            l2_dist = min(l2_length, path.length - BBOX_PACKAGE_CENTER)
+
+        time_lower = l1_dist / speed + path_start_time
+        time_upper = l2_dist / speed + path_start_time
 
-        time_lower = l1_dist / \
-            (self.uas_speed * MS_TO_MM) + uas.path_start_time
-        time_upper = l2_dist / \
-            (self.uas_speed * MS_TO_MM) + uas.path_start_time
+        return (float(time_lower), float(time_upper))
 
-        return (time_lower, time_upper)
+    def demand(self, chunk_size=DEMAND_CHUNK_SIZE):
+        """Generates the (inter arrival time, destination x, destination y, weight) of new packages
+        Every random variate is drawn as an array, chunk_size packages at a time.
+        The demand rate and radial bounds are applied per package, so a change of settings takes effect at once
+        """
+        center_x, center_y = self.center.x, self.center.y
+        while True:
+            # scaling a standard exponential draw is the same as drawing with the scale
+            inter_arrivals = self.demand_rand.standard_exponential(chunk_size)
+            rand_r = self.destination_rand.uniform(0, 1, chunk_size)
+            rand_theta = self.destination_rand.uniform(0, 2 * np.pi, chunk_size)
+            weights = get_package_weights(self.weight_rand, chunk_size)
+            for inter_arrival, r, cos, sin, weight in zip(inter_arrivals.tolist(), np.sqrt(rand_r).tolist(),
+                                                          np.cos(rand_theta).tolist(), np.sin(rand_theta).tolist(),
+                                                          weights.tolist()):
+                radius = self.radial_bounds
+                yield (inter_arrival * (1.0 / self.lambda_demand),
+                       center_x + radius * r * cos, center_y + radius * r * sin, weight)
 
     def demand_source(self):
         """Process that creates new package demand"""
         yield self.env.timeout(.1)  # add a .1 minute delay, just to make sure all our initialization is done
-        while True:
+        for inter_arrival, dest_x, dest_y, weight in self.demand():
             time = self.env.now
             if time > self.demand_stop_time:
                 break
-            package = Package(uuid4().hex, self.uid,
-                              len(self.packages), self.env.now)
-
-            # set the random destination and weight
-            package.destination = get_package_destination(
-                self.center, self.radial_bounds, self.destination_rand)
-            package.weight = get_package_weight(self.destination_rand)
+            # record the package with its random destination and weight
+            package = self.packages.add(self.env.now, dest_x, dest_y, weight)
 
             logging.debug(
-                'Sim Time: %.2f. PC %d. New package demand at %.2f. Package uid: %s', self.env.now, self.uid,  time, package.uid)
-            self.packages.append(package)
+                'Sim Time: %.2f. PC %d. New package demand at %.2f. Package: %d', self.env.now, self.uid,  time, package)
             # Launch new process independent of demand
             package_handling_process = self.handle_package(package)
             # record the process handler in case we need to cancel it later
             self.env.process(package_handling_process)
             # Schedule next event
-            t = self.demand_rand.exponential(1.0 / self.lambda_demand)
-            yield self.env.timeout(t)
+            yield self.env.timeout(inter_arrival)
@@ -0,0 +1,60 @@
+"""Holds every package of a package center as columns of preallocated arrays
+A package is referred to by its index (handle) in the ledger
+"""
+import numpy as np
+
+# Column name and type of every package attribute. Times are NaN until they are known
+PACKAGE_COLUMNS = [
+    ('creation_time', np.float64),
+    ('start_time', np.float64),
+    ('uas_wait', np.float64),
+    ('delivery_wait', np.float64),
+    ('total_wait', np.float64),
+    ('travel_dist', np.float64),
+    ('weight', np.int64),
+    ('dest_x', np.float64),
+    ('dest_y', np.float64),
+]
+
+
+class PackageLedger(object):
+    """Struct of arrays of packages. Grows by doubling when the preallocated capacity is used up
+
+    Keyword Arguments:
+        capacity {int} -- Number of packages to preallocate (default: {1024})
+    """
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.capacity = max(int(capacity), 1)
+        for name, dtype in PACKAGE_COLUMNS:
+            setattr(self, name, self._empty(dtype, self.capacity))
+
+    @staticmethod
+    def _empty(dtype, size):
+        return np.full(size, np.nan) if dtype == np.float64 else np.zeros(size, dtype=dtype)
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        for name, dtype in PACKAGE_COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, self._empty(dtype, self.capacity)]))
+        self.capacity *= 2
+
+    def add(self, creation_time, dest_x, dest_y, weight):
+        """Adds a new package and returns its handle"""
+        if self.size == self.capacity:
+            self._grow()
+        index = self.size
+        self.creation_time[index] = creation_time
+        self.dest_x[index] = dest_x
+        self.dest_y[index] = dest_y
+        self.weight[index] = weight
+        self.size += 1
+        return index
+
+    def columns(self):
+        """Returns a view of every column, trimmed to the number of packages"""
+        return {name: getattr(self, name)[:self.size] for name, _ in PACKAGE_COLUMNS}
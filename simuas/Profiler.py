@@ -0,0 +1,147 @@
+"""Opt-in timing of the hot paths of a replication
+Nothing is instrumented until Profiler.instrument is called, the original methods are
+put back by Profiler.restore, so a disabled profiler costs nothing
+"""
+import inspect
+import time
+from collections import OrderedDict
+
+from simuas import Database
+from simuas.helper import MonitoredMixin
+
+# Methods of package centers and the collision backend that are timed
+FACILITY_PHASES = ['check_collision']
+DB_PHASES = ['insert_path', 'update_path', 'remove_path', 'get_path_intersection', 'flush']
+# Class and module level functions that are timed, (class or module, attribute, name)
+CLASS_PHASES = [
+    # builds the lines of the rows of the spatial join, the spatialite backend only
+    (Database, 'row_line', 'Database.row_line'),
+    # Every monitored queue (stores, QueueCount, ChargingStations) inherits it from the mixin
+    (MonitoredMixin, '_update_tracking', 'MonitoredMixin._update_tracking'),
+]
+
+
+class Profiler(object):
+    """Counts calls and accumulates time of the phases of a replication"""
+
+    def __init__(self):
+        # name -> [calls, seconds]
+        self.timers = OrderedDict()
+        self._patched = []
+        self._env = None
+        self._start = None
+        self.wall_time = 0.0
+
+    def timer(self, name):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0.0]
+        return timer
+
+    def wrap(self, name, func):
+        """Wraps func so every call is counted and timed"""
+        timer = self.timer(name)
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer[0] += 1
+                timer[1] += perf_counter() - start
+        return wrapper
+
+    def wrap_generator(self, name, func):
+        """Wraps a generator function (a simpy process) so the time of every resumption is counted"""
+        def wrapper(*args, **kwargs):
+            return self.timed_generator(name, func(*args, **kwargs))
+        return wrapper
+
+    def timed_generator(self, name, generator):
+        timer = self.timer(name)
+        perf_counter = time.perf_counter
+        value, throw = None, False
+        while True:
+            start = perf_counter()
+            try:
+                event = generator.throw(value) if throw else generator.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                timer[0] += 1
+                timer[1] += perf_counter() - start
+            try:
+                value, throw = (yield event), False
+            except GeneratorExit:
+                generator.close()
+                raise
+            except BaseException as error:
+                value, throw = error, True
+
+    def patch(self, obj, attr, name, generator=False, static=False):
+        func = getattr(obj, attr)
+        wrapper = self.wrap_generator(name, func) if generator else self.wrap(name, func)
+        self._replace(obj, attr, staticmethod(wrapper) if static else wrapper)
+
+    def _replace(self, obj, attr, value):
+        # None means the attribute came from the class and not the object itself
+        self._patched.append((obj, attr, vars(obj).get(attr)))
+        setattr(obj, attr, value)
+
+    def instrument_env(self, env):
+        """Instruments a simpy environment. Call before creating the simulator to time every process"""
+        self._env = env
+        self.patch(env, 'step', 'simpy env.step')
+        self.timer('simpy processes')
+        # Every process resumption is timed, not just the creation of the process
+        self._replace(env, 'process', self._timed_process(env.process))
+        self._start = time.perf_counter()
+
+    def instrument(self, simulator):
+        """Instruments the hot paths of a UASSimulator"""
+        if self._env is not simulator.env:
+            self.instrument_env(simulator.env)
+        for pf in simulator.pfs:
+            self.patch(pf, 'handle_package', 'handle_package', generator=True)
+            for phase in FACILITY_PHASES:
+                self.patch(pf, phase, phase)
+        for phase in DB_PHASES:
+            if hasattr(simulator.db, phase):
+                self.patch(simulator.db, phase, phase)
+        for cls, attr, name in CLASS_PHASES:
+            # getattr_static finds attributes that are inherited, without binding them
+            self.patch(cls, attr, name, static=isinstance(inspect.getattr_static(cls, attr), staticmethod))
+
+    def _timed_process(self, process):
+        def wrapper(generator):
+            return process(self.timed_generator('simpy processes', generator))
+        return wrapper
+
+    def restore(self):
+        """Puts back every instrumented method"""
+        if self._start is not None:
+            self.wall_time += time.perf_counter() - self._start
+            self._start = None
+        for obj, attr, original in reversed(self._patched):
+            if original is None:
+                delattr(obj, attr)
+            else:
+                setattr(obj, attr, original)
+        self._patched = []
+        self._env = None
+
+    def report(self):
+        """Creates a text table of every phase. Times are inclusive of any nested phase"""
+        wall_time = self.wall_time or 1.0
+        lines = ['{:<34}{:>10}{:>12}{:>15}{:>9}'.format('Phase', 'Calls', 'Total (s)', 'Per call (us)', '% Wall')]
+        for name, (calls, seconds) in self.timers.items():
+            per_call = seconds / calls * 1e6 if calls else 0.0
+            lines.append('{:<34}{:>10d}{:>12.3f}{:>15.2f}{:>9.1f}'.format(
+                name, calls, seconds, per_call, 100 * seconds / wall_time))
+        step, processes = self.timers.get('simpy env.step'), self.timers.get('simpy processes')
+        if step and processes:
+            lines.append('{:<34}{:>10}{:>12.3f}{:>15}{:>9.1f}'.format(
+                'simpy dispatch (exclusive)', '', step[1] - processes[1], '', 100 * (step[1] - processes[1]) / wall_time))
+        lines.append('Wall time: {:.3f}s'.format(self.wall_time))
+        return '\n'.join(lines)
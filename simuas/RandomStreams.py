@@ -0,0 +1,35 @@
+"""Deterministic random streams for replications
+Every stream is keyed by (replication, package center uid, purpose) so a replication
+gives the same results no matter how many replications ran before it or in which process
+"""
+import numpy as np
+
+BASE_SEED = 20180401
+
+# Purpose of every random stream, the value is part of the stream key
+STREAM_PURPOSES = {
+    'demand': 1,
+    'destination': 2,
+    'weight': 3,
+}
+
+
+class RandomStreams(object):
+    """Creates the random streams of a replication
+
+    Arguments:
+        replication {int} -- The replication number
+
+    Keyword Arguments:
+        seed {int} -- Seed shared by all replications of an experiment (default: {BASE_SEED})
+    """
+
+    def __init__(self, replication=0, seed=BASE_SEED):
+        self.replication = replication
+        self.seed = seed
+
+    def seed_sequence(self, center_uid, purpose):
+        return np.random.SeedSequence(self.seed, spawn_key=(self.replication, center_uid, STREAM_PURPOSES[purpose]))
+
+    def generator(self, center_uid, purpose):
+        return np.random.Generator(np.random.PCG64(self.seed_sequence(center_uid, purpose)))
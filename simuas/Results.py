@@ -0,0 +1,189 @@
+"""Streams replication results to disk as columns
+Every column of every table is its own .npy file, so analysis can load or memory map only
+the columns it needs:
+
+    <root>/manifest.json
+    <root>/r0000/pc1/packages/total_wait.npy
+    <root>/r0000/pc1/battery_bank/time.npy
+"""
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from simuas.EventLog import EVENT_COLUMNS
+
+MANIFEST = 'manifest.json'
+SUMMARY = 'summary.json'
+REPLICATION_FOLDER = re.compile(r'^r\d{4,}$')
+
+# Monitored queues of a package center
+QUEUES = ['charging_stations', 'uas_queue', 'battery_bank', 'uas_bank']
+
+
+def info_columns(info):
+    """Columns of an event log, see EventLog.EVENT_COLUMNS. The event codes are EventLog.EVENT_TYPES"""
+    return {name: np.asarray(info[name], dtype=dtype) for name, dtype, _ in EVENT_COLUMNS}
+
+
+def data_tables(data_pf):
+    """Converts the data package of a package center into tables of columns"""
+    tables = {
+        'packages': dict(data_pf['packages']),
+        'info': info_columns(data_pf['info']),
+    }
+    for queue in QUEUES:
+        tables[queue] = {
+            'time': np.asarray(data_pf[queue]['cumulative_time_rec'], dtype=np.float64),
+            'item': np.asarray(data_pf[queue]['cumulative_item_rec'], dtype=np.int64),
+        }
+        occupancy = sorted(data_pf[queue]['item_time_dict'].items())
+        tables[queue + '_occupancy'] = {
+            'level': np.array([level for level, _ in occupancy], dtype=np.int64),
+            'minutes': np.array([minutes for _, minutes in occupancy], dtype=np.float64),
+        }
+    return tables
+
+
+class ResultWriter(object):
+    """Writes every replication to disk as soon as it finishes
+    The manifest only lists replications that were completely written, so a crash loses at most
+    the replication that was being written
+
+    Arguments:
+        root {str} -- Directory to write to
+
+    Keyword Arguments:
+        append {bool} -- Add to the results already in root, otherwise they are removed first (default: {False})
+    """
+
+    def __init__(self, root, append=False):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        if not append:
+            self.clear()
+        self.manifest = read_manifest(root) or {'replications': [], 'facilities': [], 'tables': {}}
+
+    def clear(self):
+        """Removes the manifest and every replication folder of earlier runs, other files in root are kept"""
+        path = os.path.join(self.root, MANIFEST)
+        if os.path.exists(path):
+            os.remove(path)
+        for name in os.listdir(self.root):
+            folder = os.path.join(self.root, name)
+            if REPLICATION_FOLDER.match(name) and os.path.isdir(folder):
+                shutil.rmtree(folder)
+
+    def write(self, replication, data_pfs):
+        """Writes the data packages of every package center of a replication"""
+        facilities = []
+        for i, data_pf in enumerate(data_pfs):
+            facility = i + 1
+            for table, columns in data_tables(data_pf).items():
+                folder = os.path.join(self.root, replication_folder(replication), 'pc{}'.format(facility), table)
+                os.makedirs(folder, exist_ok=True)
+                for name, column in columns.items():
+                    np.save(os.path.join(folder, name + '.npy'), column)
+                self.manifest['tables'][table] = list(columns)
+            facilities.append(facility)
+
+        self._add_replication(replication, facilities)
+
+    def write_summary(self, replication, summaries):
+        """Writes the summary (PackageFacility.summary) of every package center of a replication"""
+        folder = os.path.join(self.root, replication_folder(replication))
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, SUMMARY), 'w') as f:
+            json.dump(summaries, f)
+        self._add_replication(replication, list(range(1, len(summaries) + 1)))
+
+    def _add_replication(self, replication, facilities):
+        self.manifest['facilities'] = sorted(set(self.manifest['facilities']) | set(facilities))
+        if replication not in self.manifest['replications']:
+            self.manifest['replications'] = sorted(self.manifest['replications'] + [replication])
+        self._write_manifest()
+
+    def _write_manifest(self):
+        path = os.path.join(self.root, MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+
+class ResultReader(object):
+    """Loads columns of results written by ResultWriter
+
+    Arguments:
+        root {str} -- Directory the results were written to
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.manifest = read_manifest(root)
+        if self.manifest is None:
+            raise FileNotFoundError('No results found in {}'.format(root))
+
+    @property
+    def replications(self):
+        return self.manifest['replications']
+
+    @property
+    def facilities(self):
+        return self.manifest['facilities']
+
+    @property
+    def tables(self):
+        return self.manifest['tables']
+
+    def column(self, table, column, replication, facility, mmap_mode='r'):
+        """Loads (memory maps by default) a single column of a single replication and package center"""
+        path = os.path.join(self.root, replication_folder(replication), 'pc{}'.format(facility),
+                            table, column + '.npy')
+        return np.load(path, mmap_mode=mmap_mode)
+
+    def summary(self, replication):
+        """Loads the summaries of every package center of a replication written by write_summary"""
+        with open(os.path.join(self.root, replication_folder(replication), SUMMARY)) as f:
+            return json.load(f)
+
+    def load(self, table, columns=None, replications=None, facilities=None):
+        """Loads columns of a table for many replications and package centers
+
+        Arguments:
+            table {str} -- Name of the table, e.g. packages, info, battery_bank
+
+        Keyword Arguments:
+            columns {list} -- Columns to load (default: {all columns})
+            replications {list} -- Replications to load (default: {all replications})
+            facilities {list} -- Package centers to load (default: {all package centers})
+
+        Returns:
+            dict -- Concatenated columns, with a replication and facility column added
+        """
+        columns = columns or self.tables[table]
+        replications = self.replications if replications is None else replications
+        facilities = self.facilities if facilities is None else facilities
+        parts = {name: [] for name in list(columns) + ['replication', 'facility']}
+        for replication in replications:
+            for facility in facilities:
+                loaded = [self.column(table, name, replication, facility) for name in columns]
+                for name, column in zip(columns, loaded):
+                    parts[name].append(column)
+                size = len(loaded[0]) if loaded else 0
+                parts['replication'].append(np.full(size, replication, dtype=np.int64))
+                parts['facility'].append(np.full(size, facility, dtype=np.int64))
+        return {name: np.concatenate(part) if part else np.array([]) for name, part in parts.items()}
+
+
+def replication_folder(replication):
+    return 'r{:04d}'.format(replication)
+
+
+def read_manifest(root):
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,325 @@
+"""In-memory spatial index of active UAS paths
+A drop in replacement for the spatialite backed Database when checking for path intersections
+"""
+import math
+from bisect import bisect_right, insort
+from collections import defaultdict
+
+from simuas.Util import Point, Line
+from simuas.Geometry import segments, segment_distances
+from simuas.Database import RADIUS_BUFFER
+
+# Width (meters) of a grid cell in the spatial index
+GRID_CELL_SIZE = 500
+
+# Tolerance used to decide if a vector is degenerate (zero length)
+EPSILON = 1e-9
+
+# Number of candidate paths above which the distances are computed as arrays, below it is slower than the clipping
+BATCH_SIZE = 32
+
+# Slack (meters and minutes) of the time windows, rounding can not move a point out of its window
+TOLERANCE = 1e-6
+
+
+def _linear_interval(c0, c1, low, high):
+    """Solves low <= c0 + c1 * t <= high for t
+
+    Returns:
+        tuple -- (t_min, t_max) or None if there is no solution
+    """
+    if abs(c1) < EPSILON:
+        if low <= c0 <= high:
+            return (-math.inf, math.inf)
+        return None
+    t_a = (low - c0) / c1
+    t_b = (high - c0) / c1
+    return (t_a, t_b) if t_a <= t_b else (t_b, t_a)
+
+
+def _disc_interval(wx, wy, dx, dy, radius):
+    """Solves |w + t * d| <= radius for t (a line crossing a disc)
+
+    Returns:
+        tuple -- (t_min, t_max) or None if there is no solution
+    """
+    a = dx * dx + dy * dy
+    b = 2 * (wx * dx + wy * dy)
+    c = wx * wx + wy * wy - radius * radius
+    if a < EPSILON:
+        return (-math.inf, math.inf) if c <= 0 else None
+    disc = b * b - 4 * a * c
+    if disc < 0:
+        return None
+    root = math.sqrt(disc)
+    return ((-b - root) / (2 * a), (-b + root) / (2 * a))
+
+
+def segment_buffer_overlap(a: Line, b: Line, radius=RADIUS_BUFFER):
+    """Computes the portion of line b that lies inside of the buffer (capsule) around line a
+    This is the closed form equivalent of ST_Intersection(Buffer(a, radius), b)
+
+    Arguments:
+        a {Line} -- The line that is buffered
+        b {Line} -- The line that is clipped by the buffer
+
+    Keyword Arguments:
+        radius {float} -- The buffer radius (default: {RADIUS_BUFFER})
+
+    Returns:
+        Line -- The sub line of b inside the buffer, None if they do not intersect
+    """
+    dx = b.end.x - b.start.x
+    dy = b.end.y - b.start.y
+    wx = b.start.x - a.start.x
+    wy = b.start.y - a.start.y
+
+    # The buffer is a convex capsule, the union of a rectangle and two discs.
+    # A line crosses each of them in a single interval, so their union is an interval as well
+    intervals = [_disc_interval(wx, wy, dx, dy, radius),
+                 _disc_interval(b.start.x - a.end.x, b.start.y - a.end.y, dx, dy, radius)]
+    if a.length > EPSILON:
+        ux, uy = a.vector[0], a.vector[1]
+        along = _linear_interval(wx * ux + wy * uy, dx * ux + dy * uy, 0, a.length)
+        perp = _linear_interval(wx * -uy + wy * ux, dx * -uy + dy * ux, -radius, radius)
+        if along is not None and perp is not None:
+            low, high = max(along[0], perp[0]), min(along[1], perp[1])
+            if low <= high:
+                intervals.append((low, high))
+
+    intervals = [interval for interval in intervals if interval is not None]
+    if not intervals:
+        return None
+    t_min = max(min(interval[0] for interval in intervals), 0.0)
+    t_max = min(max(interval[1] for interval in intervals), 1.0)
+    if t_min > t_max:
+        return None
+
+    start = Point(b.start.x + t_min * dx, b.start.y + t_min * dy)
+    end = Point(b.start.x + t_max * dx, b.start.y + t_max * dy)
+    return Line(start, end)
+
+
+def line_within_bbox(line: Line, bbox):
+    """Equivalent of MBRWithin(line, BuildMbr(*bbox))"""
+    return (bbox[0] <= min(line.start.x, line.end.x) and max(line.start.x, line.end.x) <= bbox[2] and
+            bbox[1] <= min(line.start.y, line.end.y) and max(line.start.y, line.end.y) <= bbox[3])
+
+
+def line_bbox(line: Line, radius=0):
+    return (min(line.start.x, line.end.x) - radius, min(line.start.y, line.end.y) - radius,
+            max(line.start.x, line.end.x) + radius, max(line.start.y, line.end.y) + radius)
+
+
+def bbox_intersects(bbox_a, bbox_b):
+    return bbox_a[0] <= bbox_b[2] and bbox_b[0] <= bbox_a[2] and bbox_a[1] <= bbox_b[3] and bbox_b[1] <= bbox_a[3]
+
+
+def segment_box_interval(line: Line, box):
+    """Solves for the part of the line inside of a box, as fractions of the line (slab clipping)
+
+    Returns:
+        tuple -- (t_min, t_max) with 0 <= t_min <= t_max <= 1, None if the line misses the box
+    """
+    t_min, t_max = 0.0, 1.0
+    for start, delta, low, high in ((line.start.x, line.end.x - line.start.x, box[0], box[2]),
+                                    (line.start.y, line.end.y - line.start.y, box[1], box[3])):
+        interval = _linear_interval(start, delta, low, high)
+        if interval is None:
+            return None
+        t_min, t_max = max(t_min, interval[0]), min(t_max, interval[1])
+        if t_min > t_max:
+            return None
+    return t_min, t_max
+
+
+class TimeWindowIndex(object):
+    """Holds the time window every active flight leg spends in each grid cell
+    A cell is widened by the radius, so a UAS is in the window of every cell it comes within radius of.
+    The windows of a cell are kept sorted by the time they open.
+
+    Keyword Arguments:
+        cell_size {float} -- Width (meters) of a grid cell (default: {GRID_CELL_SIZE})
+        radius {float} -- Distance (meters) a cell is widened by (default: {RADIUS_BUFFER})
+    """
+
+    def __init__(self, cell_size=GRID_CELL_SIZE, radius=RADIUS_BUFFER):
+        self.cell_size = cell_size
+        # The tolerance keeps points that are exactly radius apart inside of each others cells
+        self.radius = radius + TOLERANCE
+        # uid -> {cell: (time enter, time exit)}
+        self.legs = {}
+        # cell -> sorted list of (time enter, time exit, uid)
+        self.cells = defaultdict(list)
+
+    def _cells(self, bbox):
+        x_min, y_min = int(math.floor(bbox[0] / self.cell_size)), int(math.floor(bbox[1] / self.cell_size))
+        x_max, y_max = int(math.floor(bbox[2] / self.cell_size)), int(math.floor(bbox[3] / self.cell_size))
+        return [(i, j) for i in range(x_min, x_max + 1) for j in range(y_min, y_max + 1)]
+
+    def insert(self, uid, line: Line, start_time, speed, pad=0):
+        """Adds the time windows of a flight leg, replacing the previous leg of the UAS
+
+        Arguments:
+            uid {int} -- Id of the UAS
+            line {Line} -- Path of the leg
+            start_time {float} -- Time the UAS begins the leg
+            speed {float} -- Speed of the UAS in meters per minute
+
+        Keyword Arguments:
+            pad {float} -- Distance (meters) every window is widened by on both sides (default: {0})
+        """
+        self.remove(uid)
+        duration = line.length / speed
+        pad_time = pad / speed + TOLERANCE
+        windows = {}
+        radius = self.radius
+        for cell in self._cells(line_bbox(line, radius)):
+            box = (cell[0] * self.cell_size - radius, cell[1] * self.cell_size - radius,
+                   (cell[0] + 1) * self.cell_size + radius, (cell[1] + 1) * self.cell_size + radius)
+            interval = segment_box_interval(line, box)
+            if interval is None:
+                continue
+            window = (start_time + interval[0] * duration - pad_time, start_time + interval[1] * duration + pad_time)
+            windows[cell] = window
+            insort(self.cells[cell], window + (uid,))
+        self.legs[uid] = windows
+
+    def remove(self, uid):
+        windows = self.legs.pop(uid, None)
+        if windows is None:
+            return
+        for cell, window in windows.items():
+            entries = self.cells[cell]
+            entries.pop(bisect_right(entries, window + (uid,)) - 1)
+            if not entries:
+                del self.cells[cell]
+
+    def concurrent(self, uid):
+        """Returns the uids of legs that share a grid cell with the leg of uid at the same time
+        Two UAS closer than the radius are in the window of the same cell, so no other leg can be
+        closer than the radius to it
+        """
+        uids = set()
+        for cell, (enter, exit_) in self.legs[uid].items():
+            entries = self.cells[cell]
+            # Only windows that open before this one closes
+            for other_enter, other_exit, other in entries[:bisect_right(entries, (exit_, math.inf))]:
+                if other_exit >= enter and other != uid:
+                    uids.add(other)
+        return uids
+
+    def overlapping(self, uid):
+        """Returns the uids of legs whose time in the cells they share with the leg of uid overlaps its own
+        The time in every shared cell is merged into one span per leg, so legs that pass through the same
+        stretch are kept even if they are in it at different ends of the stretch
+        """
+        spans = {}
+        for cell, (enter, exit_) in self.legs[uid].items():
+            for other_enter, other_exit, other in self.cells[cell]:
+                if other == uid:
+                    continue
+                span = spans.get(other)
+                if span is None:
+                    spans[other] = [enter, exit_, other_enter, other_exit]
+                else:
+                    span[0], span[1] = min(span[0], enter), max(span[1], exit_)
+                    span[2], span[3] = min(span[2], other_enter), max(span[3], other_exit)
+        return {other for other, span in spans.items() if span[0] <= span[3] and span[2] <= span[1]}
+
+
+class GridIndex(object):
+    """Holds active UAS paths in a uniform grid. Mirrors the path methods of Database
+    """
+
+    def __init__(self, cell_size=GRID_CELL_SIZE, radius=RADIUS_BUFFER):
+        self.cell_size = cell_size
+        self.radius = radius
+        self.cells = defaultdict(set)
+        # uid -> (insertion order, status, line, bbox, cells)
+        self.paths = {}
+        self.collisions = []
+        # (uid, status, start_time, line) of every leg, in the order they were recorded
+        self.archive = []
+        self._counter = 0
+
+    def _cells(self, bbox):
+        x_min, y_min = int(math.floor(bbox[0] / self.cell_size)), int(math.floor(bbox[1] / self.cell_size))
+        x_max, y_max = int(math.floor(bbox[2] / self.cell_size)), int(math.floor(bbox[3] / self.cell_size))
+        return [(i, j) for i in range(x_min, x_max + 1) for j in range(y_min, y_max + 1)]
+
+    def candidates(self, line: Line):
+        """Returns the uids of paths that share a grid cell with the buffered line, in insertion order"""
+        bbox = line_bbox(line, self.radius)
+        uids = set()
+        for cell in self._cells(bbox):
+            uids.update(self.cells.get(cell, ()))
+        uids = [uid for uid in uids if bbox_intersects(bbox, self.paths[uid][3])]
+        return sorted(uids, key=lambda uid: self.paths[uid][0])
+
+    def get_path_intersection(self, path_uid, bbox, candidates=None):
+        """Finds the buffered intersections of a path with every other path, or only with the uids in candidates"""
+        line_a = self.paths[path_uid][2]
+        uids = [uid for uid in self.candidates(line_a)
+                if uid != path_uid and (candidates is None or uid in candidates)]
+        if not uids:
+            return []
+        lines = [self.paths[uid][2] for uid in uids]
+        if len(uids) >= BATCH_SIZE:
+            # Paths farther apart than the radius are dropped in one array operation
+            near = segment_distances(segments([line_a]), segments(lines)) <= self.radius + TOLERANCE
+            uids, lines = [uid for uid, keep in zip(uids, near) if keep], [line for line, keep in zip(lines, near) if keep]
+        rows = []
+        for uid, line_b in zip(uids, lines):
+            b_geom = segment_buffer_overlap(line_a, line_b, self.radius)
+            if b_geom is None or line_within_bbox(b_geom, bbox):
+                continue
+            a_geom = segment_buffer_overlap(line_b, line_a, self.radius)
+            if a_geom is None:
+                continue
+            rows.append({'path_b_uid': uid, 'a_geom': a_geom, 'b_geom': b_geom})
+        return rows
+
+    def insert_path(self, uid, line, status='flight', start_time=None):
+        self._add(uid, status, line, self._counter)
+        self._counter += 1
+        self.archive.append((uid, status, start_time, line))
+
+    def update_path(self, uid, line, status='flight', start_time=None):
+        """Replaces the path of a UAS, it keeps its place in the insertion order like an UPDATE keeps the ROWID"""
+        order = self.paths[uid][0]
+        self.remove_path(uid)
+        self._add(uid, status, line, order)
+        self.archive.append((uid, status, start_time, line))
+
+    def _add(self, uid, status, line, order):
+        bbox = line_bbox(line)
+        cells = self._cells(bbox)
+        for cell in cells:
+            self.cells[cell].add(uid)
+        self.paths[uid] = (order, status, line, bbox, cells)
+
+    def insert_collision(self, a_uid, a_geom, b_uid, b_geom):
+        self.collisions.append((a_uid, b_uid, a_geom, b_geom))
+
+    def remove_path(self, uid):
+        path = self.paths.pop(uid, None)
+        if path is None:
+            return
+        for cell in path[4]:
+            cell_uids = self.cells[cell]
+            cell_uids.discard(uid)
+            if not cell_uids:
+                del self.cells[cell]
+
+    def clear_paths(self, table='paths'):
+        if table == 'paths':
+            self.cells.clear()
+            self.paths.clear()
+        elif table == 'paths_archive':
+            self.archive = []
+        else:
+            self.collisions = []
+
+    def close(self):
+        self.clear_paths('paths')
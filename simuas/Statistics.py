@@ -0,0 +1,274 @@
+"""Running statistics that do not keep the observations
+"""
+import math
+from collections import defaultdict
+
+
+class RunningStats(object):
+    """Mean and variance of a stream of values (Welford's algorithm)"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self._m2 / (self.n - 1) if self.n > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def half_width(self, confidence=0.95):
+        """Half width of the confidence interval of the mean (student t)"""
+        if self.n < 2:
+            return math.inf
+        return t_quantile(0.5 + confidence / 2, self.n - 1) * self.std / math.sqrt(self.n)
+
+
+# Coefficients of the rational approximations of the normal quantile (Acklam), relative error below 1.2e-9
+NORMAL_A = [-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+            1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00]
+NORMAL_B = [-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+            6.680131188771972e+01, -1.328068155288572e+01]
+NORMAL_C = [-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+            -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00]
+NORMAL_D = [7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00]
+# Below this probability (and above 1 minus it) the tail approximation is used
+NORMAL_TAIL = 0.02425
+
+
+def _polynomial(coefficients, x):
+    result = 0.0
+    for coefficient in coefficients:
+        result = result * x + coefficient
+    return result
+
+
+def normal_quantile(p):
+    """Quantile of the standard normal distribution, for 0 < p < 1"""
+    if p < NORMAL_TAIL:
+        q = math.sqrt(-2 * math.log(p))
+        return _polynomial(NORMAL_C, q) / (_polynomial(NORMAL_D, q) * q + 1)
+    if p > 1 - NORMAL_TAIL:
+        return -normal_quantile(1 - p)
+    q = p - 0.5
+    r = q * q
+    return _polynomial(NORMAL_A, r) * q / (_polynomial(NORMAL_B, r) * r + 1)
+
+
+def t_quantile(p, df):
+    """Quantile of the student t distribution
+    Exact for 1 and 2 degrees of freedom, otherwise the Cornish-Fisher expansion around the normal
+    quantile (Abramowitz and Stegun 26.7.5), within 0.2% for 3 degrees of freedom and better above
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = normal_quantile(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+# Percentiles estimated by the streaming sketch of observations
+QUANTILES = [0.5, 0.9, 0.95, 0.99]
+
+# Default length (minutes) of a batch of a time weighted statistic and number of observations in a batch
+BATCH_LENGTH = 60.0
+BATCH_SIZE = 32
+
+
+class P2Quantile(object):
+    """Streaming estimate of a quantile with five markers (the P-square algorithm of Jain and Chlamtac)
+    Memory and time per observation are constant
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value):
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+        if value < heights[0]:
+            heights[0] = value
+            k = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= heights[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        for i in range(1, 4):
+            d = self.desired[i] - self.positions[i]
+            if (d >= 1 and self.positions[i + 1] - self.positions[i] > 1) or \
+                    (d <= -1 and self.positions[i - 1] - self.positions[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, d)
+                heights[i] = height
+                self.positions[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def _linear(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+    @property
+    def value(self):
+        if not self.heights:
+            return math.nan
+        if len(self.heights) < 5:
+            # Too few observations for the markers, use the nearest rank
+            return self.heights[min(int(self.p * len(self.heights)), len(self.heights) - 1)]
+        return self.heights[2]
+
+
+def batch_summary(batches, confidence=0.95):
+    return {
+        'batch_count': batches.n,
+        'batch_variance': batches.variance,
+        'half_width': batches.half_width(confidence),
+    }
+
+
+class TimeWeightedStats(object):
+    """Online statistics of a step function, e.g. the level of a queue
+    Only time after the warm-up counts. Batch means over fixed length batches estimate the variance of the mean
+
+    Keyword Arguments:
+        warm_up {float} -- Time before which nothing is recorded (default: {0})
+        batch_length {float} -- Length of a batch (default: {BATCH_LENGTH})
+        time {float} -- Time of the first value (default: {0})
+        value {float} -- First value (default: {0})
+    """
+
+    def __init__(self, warm_up=0.0, batch_length=BATCH_LENGTH, time=0.0, value=0):
+        self.warm_up = warm_up
+        self.batch_length = batch_length
+        self._time = time
+        self._value = value
+        self.area = 0.0
+        self.duration = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        # value -> time spent at that value
+        self.histogram = defaultdict(float)
+        self.batches = RunningStats()
+        self._batch_area = 0.0
+        self._batch_end = warm_up + batch_length
+
+    def update(self, time, value):
+        self.advance(time)
+        self._value = value
+
+    def advance(self, time):
+        """Accumulates the current value up to time"""
+        value = self._value
+        start = max(self._time, self.warm_up)
+        while start < time:
+            end = min(time, self._batch_end)
+            span = end - start
+            self.area += span * value
+            self.duration += span
+            self.histogram[value] += span
+            self._batch_area += span * value
+            if end == self._batch_end:
+                self.batches.add(self._batch_area / self.batch_length)
+                self._batch_area = 0.0
+                self._batch_end += self.batch_length
+            start = end
+        if time > self.warm_up:
+            self.minimum = min(self.minimum, value)
+            self.maximum = max(self.maximum, value)
+        self._time = max(self._time, time)
+
+    @property
+    def mean(self):
+        return self.area / self.duration if self.duration else math.nan
+
+    def summary(self, time=None, confidence=0.95):
+        if time is not None:
+            self.advance(time)
+        summary = {
+            'mean': self.mean,
+            'duration': self.duration,
+            'min': self.minimum if self.duration else math.nan,
+            'max': self.maximum if self.duration else math.nan,
+            'histogram': dict(sorted(self.histogram.items())),
+        }
+        summary.update(batch_summary(self.batches, confidence))
+        return summary
+
+
+class ObservationStats(object):
+    """Online statistics of observations, e.g. the wait of every package
+    Batch means over batches of batch_size observations estimate the variance of the mean
+
+    Keyword Arguments:
+        batch_size {int} -- Number of observations in a batch (default: {BATCH_SIZE})
+        quantiles {list} -- Quantiles estimated with a streaming sketch (default: {QUANTILES})
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, quantiles=QUANTILES):
+        self.batch_size = batch_size
+        self.stats = RunningStats()
+        self.batches = RunningStats()
+        self._batch_sum = 0.0
+        self._batch_count = 0
+        self.sketches = [P2Quantile(q) for q in quantiles]
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value):
+        self.stats.add(value)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        for sketch in self.sketches:
+            sketch.add(value)
+        self._batch_sum += value
+        self._batch_count += 1
+        if self._batch_count == self.batch_size:
+            self.batches.add(self._batch_sum / self.batch_size)
+            self._batch_sum = 0.0
+            self._batch_count = 0
+
+    def summary(self, confidence=0.95):
+        summary = {
+            'count': self.stats.n,
+            'mean': self.stats.mean if self.stats.n else math.nan,
+            'variance': self.stats.variance,
+            'min': self.minimum if self.stats.n else math.nan,
+            'max': self.maximum if self.stats.n else math.nan,
+            'quantiles': {sketch.p: sketch.value for sketch in self.sketches},
+        }
+        summary.update(batch_summary(self.batches, confidence))
+        return summary
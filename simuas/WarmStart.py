@@ -0,0 +1,103 @@
+"""Runs the warm-up of a replication once and forks variants from its state
+The simulator is forked as an operating system process, so the fleet, batteries, pending events,
+random stream states and active paths of every variant are exactly the state at the end of the
+warm-up. Variants share the random streams of the replication (common random numbers).
+
+Where os.fork is not available the warm-up is replayed for every variant instead. Every replication
+derives its own random seeds, so the replayed state is the same, only slower to reach.
+"""
+import logging
+import os
+import pickle
+
+import simpy
+
+from simuas.main import UASSimulator, OPTIONS, MAX_SIM_TIME
+from simuas.RandomStreams import BASE_SEED
+
+# Four hours of warm-up
+WARM_UP_TIME = 4 * 60
+
+
+def apply_variant(simulator, variant):
+    """Applies a variant to the package centers of a simulator
+
+    Arguments:
+        variant {dict, list} -- Settings for every package center, or a list with the settings of each package center
+    """
+    settings = variant if isinstance(variant, list) else [variant] * len(simulator.pfs)
+    for pf, pf_settings in zip(simulator.pfs, settings):
+        pf.apply(**pf_settings)
+
+
+def run_variant(simulator, variant):
+    apply_variant(simulator, variant)
+    simulator.run()
+    return simulator.data_pfs
+
+
+def warm_simulator(options, replication, seed, max_sim_time, warm_up):
+    env = simpy.Environment()
+    simulator = UASSimulator(env, options, replication, seed, max_sim_time)
+    env.run(warm_up)
+    return simulator
+
+
+def fork_variant(simulator, variant):
+    """Runs a variant in a forked child process and returns the file to read its results from"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 0
+        with os.fdopen(write_fd, 'wb') as f:
+            try:
+                result = run_variant(simulator, variant)
+            except BaseException as error:
+                result, status = error, 1
+            pickle.dump((status, result), f, pickle.HIGHEST_PROTOCOL)
+        # Do not run any cleanup of the parent (atexit, open connections) in the child
+        os._exit(status)
+    os.close(write_fd)
+    return pid, os.fdopen(read_fd, 'rb')
+
+
+def collect(pid, f):
+    with f:
+        status, result = pickle.load(f)
+    os.waitpid(pid, 0)
+    if status:
+        raise result
+    return result
+
+
+def run_variants(variants, warm_up=WARM_UP_TIME, options=OPTIONS, replication=0, seed=BASE_SEED,
+                 max_sim_time=MAX_SIM_TIME, workers=1):
+    """Runs the warm-up of a replication once, then every variant from the state at the end of the warm-up
+
+    Arguments:
+        variants {list} -- Settings to apply at the end of the warm-up, see apply_variant
+
+    Keyword Arguments:
+        warm_up {float} -- Time (minutes) the variants are forked at (default: {WARM_UP_TIME})
+        workers {int} -- Number of variants that run at the same time (default: {1})
+
+    Returns:
+        list -- The data packages of every package center, for every variant
+    """
+    simulator = warm_simulator(options, replication, seed, max_sim_time, warm_up)
+    if not hasattr(os, 'fork'):
+        logging.warning('os.fork is not available, the warm-up is replayed for every variant')
+        results = []
+        for i, variant in enumerate(variants):
+            if i > 0:
+                simulator = warm_simulator(options, replication, seed, max_sim_time, warm_up)
+            results.append(run_variant(simulator, variant))
+        return results
+
+    results = []
+    for start in range(0, len(variants), max(workers, 1)):
+        # Every child is forked before any result is read, so a wave of variants runs at the same time
+        children = [fork_variant(simulator, variant) for variant in variants[start:start + max(workers, 1)]]
+        results.extend(collect(pid, f) for pid, f in children)
+    return results
@@ -0,0 +1,169 @@
+"""Benchmarks simulator throughput and the cost of collision checks
+Runs UASSimulator across a parameter grid and writes the results to a JSON file,
+e.g. python -m simuas.benchmark --output ./data/benchmark.json
+"""
+import argparse
+import copy
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+import simpy
+
+from simuas.main import UASSimulator, OPTIONS
+from simuas.Profiler import Profiler
+
+try:
+    import resource
+except ImportError:
+    # Not available on windows, peak memory is not reported
+    resource = None
+
+# Distance (meters) between package centers when more are added to a scenario
+FACILITY_SPACING = 1100
+
+GRID = {
+    'lambda_demand': [1.28, 2.56],
+    'uas_capacity': [17],
+    'n_facilities': [1, 2, 4, 16],
+    'max_sim_time': [4 * 60],
+    'collision_backend': ['grid'],
+    'collision_model': ['buffer'],
+}
+
+
+class CountingEnvironment(simpy.Environment):
+    """A simpy environment that counts every processed event"""
+
+    def __init__(self, initial_time=0):
+        super(CountingEnvironment, self).__init__(initial_time)
+        self.event_count = 0
+
+    def step(self):
+        self.event_count += 1
+        super(CountingEnvironment, self).step()
+
+
+def facility_grid(n_facilities, center=OPTIONS['package_facilities'][0]['center'], spacing=FACILITY_SPACING):
+    """Places n package centers on a square grid, starting at center"""
+    columns = int(math.ceil(math.sqrt(n_facilities)))
+    return [[center[0] + (i % columns) * spacing, center[1] + (i // columns) * spacing] for i in range(n_facilities)]
+
+
+def scenario_options(lambda_demand, uas_capacity, n_facilities, collision_backend, collision_model):
+    options = copy.deepcopy(OPTIONS)
+    template = options['package_facilities'][0]
+    options['collision_backend'] = collision_backend
+    options['collision_model'] = collision_model
+    options['package_facilities'] = []
+    for center in facility_grid(n_facilities):
+        facility = dict(template, lambda_demand=lambda_demand, uas_capacity=uas_capacity, center=center)
+        options['package_facilities'].append(facility)
+    return options
+
+
+def run_cell(cell):
+    """Runs a single scenario of the grid and measures it"""
+    # Collisions are logged as errors, we only want to measure the simulation
+    logging.disable(logging.CRITICAL)
+    options = scenario_options(cell['lambda_demand'], cell['uas_capacity'], cell['n_facilities'],
+                               cell['collision_backend'], cell['collision_model'])
+    env = CountingEnvironment()
+    start = time.perf_counter()
+    simulator = UASSimulator(env, options, max_sim_time=cell['max_sim_time'])
+
+    profiler = Profiler()
+    for pf in simulator.pfs:
+        profiler.patch(pf, 'check_collision', 'check_collision')
+    profiler.patch(simulator.db, 'get_path_intersection', 'get_path_intersection')
+
+    simulator.run()
+    wall_time = time.perf_counter() - start
+    profiler.restore()
+
+    result = dict(cell)
+    result.update({
+        'wall_time': wall_time,
+        'wall_time_per_sim_hour': wall_time / (cell['max_sim_time'] / 60.0),
+        'events': env.event_count,
+        'events_per_second': env.event_count / wall_time,
+        'packages': sum(len(pf.packages) for pf in simulator.pfs),
+        'peak_memory_mb': peak_memory_mb(),
+    })
+    for name, (calls, seconds) in profiler.timers.items():
+        result[name + '_seconds'] = seconds
+        result[name + '_calls'] = calls
+    return result
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, mac reports bytes
+    return peak / 1024.0 ** 2 if platform.system() == 'Darwin' else peak / 1024.0
+
+
+def grid_cells(grid=GRID):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def code_version():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(grid=GRID, repeat=1):
+    """Runs every cell of the grid in a fresh process, so peak memory is measured per cell"""
+    cells = [cell for cell in grid_cells(grid) for _ in range(repeat)]
+    with multiprocessing.get_context('spawn').Pool(1, maxtasksperchild=1) as pool:
+        results = []
+        for result in pool.imap(run_cell, cells):
+            logging.warning('%s', ', '.join('{}={}'.format(key, result[key]) for key in grid) +
+                            ' -> {:.2f}s, {:.0f} events/s'.format(result['wall_time'], result['events_per_second']))
+            results.append(result)
+    return {
+        'created': datetime.now().isoformat(),
+        'version': code_version(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'simpy': simpy.__version__,
+        'grid': grid,
+        'results': results,
+    }
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description='UAS Package Simulator benchmarks')
+    parser.add_argument('--output', default='./data/benchmark.json', help='JSON file to write results to')
+    parser.add_argument('--repeat', type=int, default=1, help='number of times to run every cell')
+    for name, values in GRID.items():
+        kind = str if isinstance(values[0], str) else type(values[0])
+        parser.add_argument('--' + name, type=kind, nargs='+', default=values)
+    return parser.parse_args(args)
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARN)
+    grid = {name: getattr(args, name) for name in GRID}
+    report = run_benchmark(grid, args.repeat)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
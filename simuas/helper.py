@@ -3,161 +3,116 @@
 # 2) Patching _do_put and _do_get to include custom call backs
 # 3) Add tracking and reporting methods
 
+import heapq
 import simpy
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
+import numpy as np
 
 
 
 def condense(queue):
+    """Exports the time series of a monitored queue, the arrays are zero-copy views"""
+    time_rec, item_rec = queue._series.as_arrays()
     return {
-        'cumulative_item_rec': queue._cumulative_item_rec,
-        'cumulative_time_rec': queue._cumulative_time_rec,
+        'cumulative_item_rec': item_rec,
+        'cumulative_time_rec': time_rec,
         'item_time_dict': queue._item_time_dict
     }
 
-class QueueCount(object):
-    def __init__(self, env, initial_count=0):
-        self._env = env
-        self.items = []
-        self._last_value = len(self.items)
-        self._cumulative_item_rec = []
-        self._cumulative_time_rec = []
-
-        self.reset_tracking()
-
-        # simpy.Store._do_put method override
-    def add(self):
-        self.items.append(1)
-        self._update_tracking()
-
-    # simpy.Store._do_get method override
-    def remove(self):
-        if self.items:
-            self.items.pop(0)
-            self._update_tracking()
-
-    def reset_tracking(self):
-        self._last_reset = self._env.now
-        self._last_time = self._env.now
-        self._weighted_items = 0.0
-
-        self._item_rec = []
-        self._time_rec = []
-        self._item_time_dict = defaultdict(int)
-        self._item_time_dict[self._last_value] = 0
-        self._update_tracking()
 
-    def _update_tracking(self):
-        if self._env.now > self._last_time or len(self._item_rec) == 0:
-            time_delta = self._env.now - self._last_time
-            self._weighted_items += time_delta * float(self._last_value)
-            self._item_rec.append(self._last_value)
-            self._time_rec.append(time_delta)
-            self._item_time_dict[self._last_value] += time_delta
-        self._last_value = len(self.items)
-        self._last_time = self._env.now
-        if len(self._cumulative_item_rec) == 0:
-            self._cumulative_item_rec.append(self._last_value)
-            self._cumulative_time_rec.append(self._last_time)
+class TimeSeriesRecorder(object):
+    """Records a step function (time, value) in growable typed arrays
+    A change of value is stored as two points, the old value and the new value at the same time
+    Arrays that were exported by as_arrays can not grow, the next record copies them first
+    """
+
+    def __init__(self):
+        self.times = array('d')
+        self.values = array('q')
+        self._exported = False
+
+    def __len__(self):
+        return len(self.times)
+
+    def record(self, time, value):
+        if self._exported:
+            self.times = array('d', self.times)
+            self.values = array('q', self.values)
+            self._exported = False
+        if len(self.times) == 0:
+            self.times.append(time)
+            self.values.append(value)
+        elif time != self.times[-1]:
+            self.times.append(time)
+            self.values.append(self.values[-1])
+            self.times.append(time)
+            self.values.append(value)
         else:
-            if self._last_time != self._cumulative_time_rec[-1]:
-                self._cumulative_item_rec.append(self._cumulative_item_rec[-1])
-                self._cumulative_time_rec.append(self._last_time)
-                self._cumulative_item_rec.append(self._last_value)
-                self._cumulative_time_rec.append(self._last_time)
-            else:
-                self._cumulative_item_rec.pop(-1)
-                self._cumulative_item_rec.append(self._last_value)
+            self.values[-1] = value
 
-    # def add(self):
-    #     self.update_tracking(self.count + 1)
+    def as_arrays(self):
+        self._exported = True
+        return np.frombuffer(self.times, dtype=np.float64), np.frombuffer(self.values, dtype=np.int64)
 
-    # def update_tracking(self, new_count):
-    #     delta_t = self.env.now - self.last_time
-    #     self.time_records[self.count] = self.time_records.get(self.count, 0) + delta_t
 
-    #     self.count = new_count
-    #     self.last_time = self.env.now
+class MonitoredMixin(object):
+    """Tracks the number of items over time. Keeps a running time weighted sum so the average is O(1)
+    """
+    # Online statistics of the level, e.g. TimeWeightedStats, see attach_stats
+    stats = None
 
-    # def remove(self):
-    #     self.update_tracking(self.count - 1)
+    def _level(self):
+        return len(self.items)
 
-
-class MonitoredStore(simpy.Store):
-    def __init__(self, env, capacity=float('inf')):
-        super(MonitoredStore, self).__init__(env, capacity)
-
-        self._last_value = len(self.items)
-        self._cumulative_item_rec = []
-        self._cumulative_time_rec = []
+    def _init_tracking(self):
+        self._last_value = self._level()
+        self._series = TimeSeriesRecorder()
 
         self.reset_tracking()
 
-    # simpy.Store._do_put method override
-    def _do_put(self, event):
-        if len(self.items) < self._capacity:
-            self.items.append(event.item)
-            event.succeed()
-            self._update_tracking()
-
-    # simpy.Store._do_get method override
-    def _do_get(self, event):
-        if self.items:
-            event.succeed(self.items.pop(0))
-            self._update_tracking()
-
     def reset_tracking(self):
         self._last_reset = self._env.now
         self._last_time = self._env.now
         self._weighted_items = 0.0
+        self._tracking_started = False
 
-        self._item_rec = []
-        self._time_rec = []
         self._item_time_dict = defaultdict(int)
         self._item_time_dict[self._last_value] = 0
         self._update_tracking()
 
     def _update_tracking(self):
-        if self._env.now > self._last_time or len(self._item_rec) == 0:
+        if self._env.now > self._last_time or not self._tracking_started:
             time_delta = self._env.now - self._last_time
             self._weighted_items += time_delta * float(self._last_value)
-            self._item_rec.append(self._last_value)
-            self._time_rec.append(time_delta)
             self._item_time_dict[self._last_value] += time_delta
-        self._last_value = len(self.items)
+            self._tracking_started = True
+        self._last_value = self._level()
         self._last_time = self._env.now
-        if len(self._cumulative_item_rec) == 0:
-            self._cumulative_item_rec.append(self._last_value)
-            self._cumulative_time_rec.append(self._last_time)
-        else:
-            if self._last_time != self._cumulative_time_rec[-1]:
-                self._cumulative_item_rec.append(self._cumulative_item_rec[-1])
-                self._cumulative_time_rec.append(self._last_time)
-                self._cumulative_item_rec.append(self._last_value)
-                self._cumulative_time_rec.append(self._last_time)
-            else:
-                self._cumulative_item_rec.pop(-1)
-                self._cumulative_item_rec.append(self._last_value)
+        self._series.record(self._last_time, self._last_value)
+        if self.stats is not None:
+            self.stats.update(self._last_time, self._last_value)
+
+    def attach_stats(self, stats):
+        """Feeds every change of the level to stats, an object with an update(time, value) method"""
+        self.stats = stats
+        stats.update(self._env.now, self._level())
 
     @property
     def avg_value(self):
-        try:
-            if self._env.now > self._time_rec[-1]:
-                self._update_tracking()
-        except Exception:
-            self._update_tracking()
+        self._update_tracking()
 
         time_delta = float(self._env.now - self._last_reset)
         if time_delta == 0:
             time_delta = 1
 
-        return sum(x * y for (x, y) in zip(self._time_rec, self._item_rec)) / time_delta
+        return self._weighted_items / time_delta
 
     @property
     def time_series(self):
         self._update_tracking()
         string = 'Time\tValue\n'
-        for time, value in zip(self._cumulative_time_rec, self._cumulative_item_rec):
+        for time, value in zip(self._series.times, self._series.values):
             string += '%f\t%d\n' % (time, value)
 
         return string
@@ -175,15 +130,134 @@ class MonitoredStore(simpy.Store):
         print('Cumulated Avg: %f' % self.avg_value)
 
 
-class MonitoredFilterStore(simpy.FilterStore, MonitoredStore):
+class QueueCount(MonitoredMixin):
+    """Counts items that are waiting, without holding them"""
+
+    def __init__(self, env, initial_count=0):
+        self._env = env
+        self.count = initial_count
+
+        self._init_tracking()
+
+    def _level(self):
+        return self.count
+
+    def add(self):
+        self.count += 1
+        self._update_tracking()
+
+    def remove(self):
+        if self.count:
+            self.count -= 1
+            self._update_tracking()
+
+
+class ChargingStations(MonitoredMixin):
+    """Infinite charging stations. Pending completions are kept in a heap and a single timer is
+    scheduled for the earliest one, instead of a process and a timeout for every item
+
+    Arguments:
+        env {simpy.Environment} -- The simulation environment
+        on_charged {callable} -- Called with the item when it is done charging
+    """
+
+    def __init__(self, env, on_charged):
+        self._env = env
+        self.on_charged = on_charged
+        # heap of (completion time, sequence, item), the sequence keeps ties first in first out
+        self.items = []
+        self._sequence = 0
+        self._timer = None
+        self._timer_time = None
+
+        self._init_tracking()
+
+    def charge(self, item, duration):
+        completion = self._env.now + duration
+        heapq.heappush(self.items, (completion, self._sequence, item))
+        self._sequence += 1
+        self._update_tracking()
+        if self._timer is None or completion < self._timer_time:
+            self._schedule()
+
+    def _schedule(self):
+        self._timer_time = self.items[0][0]
+        self._timer = self._env.timeout(self._timer_time - self._env.now)
+        self._timer.callbacks.append(self._complete)
+
+    def _complete(self, timer):
+        if timer is not self._timer:
+            # An earlier completion was added after this timer was scheduled
+            return
+        self._timer = None
+        while self.items and self.items[0][0] <= self._timer_time:
+            _, _, item = heapq.heappop(self.items)
+            self._update_tracking()
+            self.on_charged(item)
+        if self.items:
+            self._schedule()
+
+
+class MonitoredStore(MonitoredMixin, simpy.Store):
+    """First in first out store, items are held in a deque so both ends are O(1)"""
+
     def __init__(self, env, capacity=float('inf')):
-        super(MonitoredFilterStore, self).__init__(env, capacity)
+        super(MonitoredStore, self).__init__(env, capacity)
+        self.items = deque()
 
-        self._last_value = len(self.items)
-        self._cumulative_item_rec = []
-        self._cumulative_time_rec = []
+        self._init_tracking()
 
-        self.reset_tracking()
+    # simpy.Store._do_put method override
+    def _do_put(self, event):
+        if len(self.items) < self._capacity:
+            self.items.append(event.item)
+            event.succeed()
+            self._update_tracking()
+
+    # simpy.Store._do_get method override
+    def _do_get(self, event):
+        if self.items:
+            event.succeed(self.items.popleft())
+            self._update_tracking()
+
+
+class MonitoredPriorityStore(MonitoredMixin, simpy.Store):
+    """Store that hands out the item with the lowest key first, e.g. key=lambda battery: -charge[battery]
+    hands out the battery with the highest charge. Items with the same key are first in first out
+
+    Keyword Arguments:
+        capacity {float} -- Maximum number of items (default: {inf})
+        key {callable} -- Priority of an item, computed when it is put (default: {None, the item itself})
+    """
+
+    def __init__(self, env, capacity=float('inf'), key=None):
+        super(MonitoredPriorityStore, self).__init__(env, capacity)
+        self.key = key
+        # heap of (key, sequence, item)
+        self.items = []
+        self._sequence = 0
+
+        self._init_tracking()
+
+    # simpy.Store._do_put method override
+    def _do_put(self, event):
+        if len(self.items) < self._capacity:
+            key = event.item if self.key is None else self.key(event.item)
+            heapq.heappush(self.items, (key, self._sequence, event.item))
+            self._sequence += 1
+            event.succeed()
+            self._update_tracking()
+
+    # simpy.Store._do_get method override
+    def _do_get(self, event):
+        if self.items:
+            event.succeed(heapq.heappop(self.items)[2])
+            self._update_tracking()
+
+
+class MonitoredFilterStore(simpy.FilterStore, MonitoredStore):
+    def __init__(self, env, capacity=float('inf')):
+        super(MonitoredFilterStore, self).__init__(env, capacity)
 
     # simpy.FilterStore._do_get method override
     def _do_get(self, event):
@@ -1,17 +1,34 @@
 """Main Module for UAS Simulator
 """
-import sys
+import argparse
 import logging
-import pickle
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import simpy
 from simuas.PackageFacility import PackageFacility
+from simuas.Airspace import Airspace
 from simuas.Database import Database
+from simuas.SpatialIndex import GridIndex
+from simuas.ClosestApproach import ClosestApproach
+from simuas.RandomStreams import RandomStreams, BASE_SEED
+from simuas.Profiler import Profiler
+from simuas.Results import ResultWriter
 
 
 MAX_SIM_TIME = 12 * 60
 N_REPLICATIONS = 30
+RESULTS_PATH = './data/repl_results_dual'
+
+# Backends that hold active paths and find their intersections
+COLLISION_BACKENDS = {
+    'spatialite': lambda: Database(':memory:'),
+    'grid': GridIndex
+}
 
 OPTIONS = {
+    'collision_backend': 'spatialite',
+    # 'buffer' intersects buffered paths, 'closest_approach' solves for the minimum separation
+    'collision_model': 'buffer',
     'package_facilities_global': {
         'battery_capacity': 100
     },
@@ -32,13 +49,24 @@ OPTIONS = {
 }
 
 
+LOG_LEVELS = {
+    'info': logging.INFO,
+    'debug': logging.DEBUG,
+}
+
+
 class UASSimulator(object):
-    def __init__(self, env, options):
-        self.db = Database(':memory:')
+    def __init__(self, env, options, replication=0, seed=BASE_SEED, max_sim_time=MAX_SIM_TIME):
+        self.db = COLLISION_BACKENDS[options.get('collision_backend', 'spatialite')]()
         # self.db = Database()
-        self.db.clear_paths('paths')
-        self.db.clear_paths('paths_collision')
         self.env = env
+        self.max_sim_time = max_sim_time
+        self.streams = RandomStreams(replication, seed)
+        self.conflict_engine = None
+        if options.get('collision_model', 'buffer') == 'closest_approach':
+            self.conflict_engine = ClosestApproach()
+        # Every package center shares the airspace, it starts out empty
+        self.airspace = Airspace(self.db, self.conflict_engine)
 
         # Single Package Facility
         # kw_dict = dict(options['package_facilities_global'])
@@ -49,35 +77,114 @@ class UASSimulator(object):
         for i, facility in enumerate(options['package_facilities']):
             kw_dict = dict(options['package_facilities_global'])
             kw_dict.update(facility)
-            self.pfs.append(PackageFacility(env, i+1, self.db, **kw_dict))
+            kw_dict.setdefault('demand_stop_time', max_sim_time)
+            self.pfs.append(PackageFacility(env, i+1, self.airspace, streams=self.streams, **kw_dict))
 
 
     def run(self):
-        self.env.run(MAX_SIM_TIME) # stop at max simulation time
+        self.env.run(self.max_sim_time) # stop at max simulation time
         self.data_pfs = [pf.data_package() for pf in self.pfs] # create data package for each package center
-        self.db.conn.commit()
-        self.db.conn.close()
+        self.summaries = [pf.summary() for pf in self.pfs]
+        self.db.close()
+
+
+def run_replication(replication, options=OPTIONS, seed=BASE_SEED, max_sim_time=MAX_SIM_TIME, summary=False):
+    """Runs a single replication and returns the data package of every package center
+    With summary only the compact statistics of every package center are returned
+    """
+    env = simpy.Environment()
+    simulator = UASSimulator(env, options, replication, seed, max_sim_time)
+    simulator.run()
+    return simulator.summaries if summary else simulator.data_pfs
+
+
+def run_profile(n_replications=N_REPLICATIONS, options=OPTIONS, max_sim_time=MAX_SIM_TIME):
+    """Runs replications serially with the hot paths instrumented, prints a timing report for each"""
+    for i in range(n_replications):
+        env = simpy.Environment()
+        profiler = Profiler()
+        profiler.instrument_env(env)
+        simulator = UASSimulator(env, options, i, max_sim_time=max_sim_time)
+        profiler.instrument(simulator)
+        try:
+            simulator.run()
+        finally:
+            profiler.restore()
+        print('Replication {}'.format(i))
+        print(profiler.report())
+
+
+def init_worker(level):
+    logging.basicConfig(level=level)
+
+
+def iter_replications(n_replications=N_REPLICATIONS, options=OPTIONS, workers=1, level=logging.WARN, summary=False):
+    """Runs replications, spread across a process pool when workers > 1
+    Yields the data of every replication in replication order, as soon as it is available
+
+    Every replication derives its own random seeds, so the results are identical
+    to a serial run
+    """
+    if workers <= 1:
+        for i in range(n_replications):
+            yield run_replication(i, options, summary=summary)
+        return
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(level,)) as executor:
+        yield from executor.map(run_replication, range(n_replications), repeat(options), repeat(BASE_SEED),
+                                repeat(MAX_SIM_TIME), repeat(summary))
+
+
+def run_replications(n_replications=N_REPLICATIONS, options=OPTIONS, workers=1, level=logging.WARN):
+    """Runs replications and returns the data of all of them, in replication order"""
+    return list(iter_replications(n_replications, options, workers, level))
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description='UAS Package Simulator')
+    parser.add_argument('level', nargs='?', choices=list(LOG_LEVELS) + ['profile'],
+                        help='logging level, or profile to print where each replication spends its time')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes to run replications in')
+    parser.add_argument('--replications', type=int, default=N_REPLICATIONS,
+                        help='number of replications, the maximum number when --precision is given')
+    # the stopping rule is computed from the full traces, so it can not only store summaries
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--precision', type=float, default=None,
+                      help='run replications until the confidence interval of every key output is within this relative precision')
+    mode.add_argument('--summary', action='store_true',
+                      help='only store the statistics after the warm-up of every replication, not the full traces')
+    parser.add_argument('--output', default=RESULTS_PATH, help='directory the results are streamed to')
+    parser.add_argument('--append', action='store_true',
+                        help='add to the results already in --output instead of replacing them')
+    return parser.parse_args(args)
 
 
 def main():
+    args = parse_args()
     print('Begin Execution')
-    if len(sys.argv) > 1:
-        if sys.argv[1] == 'info':
-            logging.basicConfig(level=logging.INFO)
-        elif sys.argv[1] == 'debug':
-            logging.basicConfig(level=logging.DEBUG)
-    else:
-        logging.basicConfig(level=logging.WARN)
-
-    # Store replication data
-    replications = []
-    for i in range(N_REPLICATIONS):
-        env = simpy.Environment()
-        simulator = UASSimulator(env, OPTIONS)
-        simulator.run()
-        replications.append(simulator.data_pfs)
+    level = LOG_LEVELS.get(args.level, logging.WARN)
+    logging.basicConfig(level=level)
+
+    if args.level == 'profile':
+        run_profile(args.replications, OPTIONS)
+        return
 
-    pickle.dump(replications, open("./data/repl_results_dual.p", "wb"))
+    # Store replication data as soon as each replication finishes
+    writer = ResultWriter(args.output, append=args.append)
+    if args.precision is not None:
+        # imported here, the adaptive controller runs replications with this module
+        from simuas.Adaptive import AdaptiveReplications
+        controller = AdaptiveReplications(args.precision, max_replications=args.replications)
+        summary = controller.run(OPTIONS, args.workers, on_result=writer.write, level=level)
+        print('Stopped after {} replications'.format(controller.n))
+        for name, (mean, half_width, converged) in summary.items():
+            print('{}: {:.3f} +- {:.3f}{}'.format(name, mean, half_width, '' if converged else ' (not converged)'))
+        return
+    replications = iter_replications(args.replications, OPTIONS, args.workers, level, args.summary)
+    for i, data_pfs in enumerate(replications):
+        if args.summary:
+            writer.write_summary(i, data_pfs)
+        else:
+            writer.write(i, data_pfs)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,142 @@
+"""Runs a parameter sweep over package center settings
+Every cell of the grid runs its replications in a process pool. Results are cached on disk by a
+hash of (options, seed, simulation time, source hash), so an extended sweep only runs the new
+cells and replications, e.g. python -m simuas.sweep --lambda_demand 1.28 2.56 --replications 10
+"""
+import argparse
+import copy
+import glob
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from simuas.main import OPTIONS, MAX_SIM_TIME, N_REPLICATIONS, run_replication, init_worker
+from simuas.RandomStreams import BASE_SEED
+from simuas.benchmark import grid_cells
+from simuas.Results import ResultWriter, read_manifest
+
+CACHE_PATH = './data/sweep_cache'
+CELL_FILE = 'cell.json'
+
+# Keyword arguments of PackageFacility that can be swept, with their default grid
+GRID = {
+    'lambda_demand': [1.28],
+    'uas_capacity': [17],
+    'battery_capacity': [100],
+    'mu_battery': [80],
+    'uas_speed': [7.5],
+    'radial_bounds': [2750],
+    'safety_battery_level': [20],
+}
+
+
+def cell_options(cell, options=OPTIONS):
+    """Applies the settings of a cell to every package center of options"""
+    options = copy.deepcopy(options)
+    for facility in options['package_facilities']:
+        facility.update(cell)
+    return options
+
+
+def source_hash():
+    """Hash of every source file of the simulator, any change of the code invalidates the cache"""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def normalize(value):
+    """Whole floats become ints, so 3000 and 3000.0 give the same cache key"""
+    if isinstance(value, dict):
+        return {name: normalize(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def cache_key(options, seed, max_sim_time, source):
+    description = json.dumps(normalize({'options': options, 'seed': seed, 'max_sim_time': max_sim_time,
+                                        'source_hash': source}), sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def cached_replications(folder):
+    manifest = read_manifest(folder)
+    return set(manifest['replications']) if manifest else set()
+
+
+def run_sweep(grid=GRID, n_replications=N_REPLICATIONS, workers=1, cache=CACHE_PATH, seed=BASE_SEED,
+              max_sim_time=MAX_SIM_TIME, options=OPTIONS, level=logging.WARN):
+    """Runs every replication of every cell of the grid that is not in the cache yet
+
+    Keyword Arguments:
+        grid {dict} -- Values of every swept PackageFacility keyword argument (default: {GRID})
+        n_replications {int} -- Replications of every cell (default: {N_REPLICATIONS})
+        workers {int} -- Number of processes to run replications in (default: {1})
+        cache {str} -- Directory of the cache (default: {CACHE_PATH})
+
+    Returns:
+        list -- One dict per cell with its settings, cache folder and number of replications run
+    """
+    source = source_hash()
+    cells, jobs, writers = [], [], {}
+    for cell in grid_cells(grid):
+        cell_opts = cell_options(cell, options)
+        key = cache_key(cell_opts, seed, max_sim_time, source)
+        folder = os.path.join(cache, key)
+        missing = sorted(set(range(n_replications)) - cached_replications(folder))
+        if missing:
+            # the replications of the cell that are cached already are kept
+            writers[key] = ResultWriter(folder, append=True)
+            with open(os.path.join(folder, CELL_FILE), 'w') as f:
+                json.dump({'cell': cell, 'options': cell_opts, 'seed': seed, 'max_sim_time': max_sim_time,
+                           'source_hash': source}, f, indent=2)
+        jobs.extend((key, replication, cell_opts) for replication in missing)
+        cells.append({'cell': cell, 'key': key, 'folder': folder, 'run': len(missing)})
+
+    if workers <= 1:
+        for key, replication, cell_opts in jobs:
+            writers[key].write(replication, run_replication(replication, cell_opts, seed, max_sim_time))
+        return cells
+
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(level,)) as executor:
+        futures = {executor.submit(run_replication, replication, cell_opts, seed, max_sim_time): (key, replication)
+                   for key, replication, cell_opts in jobs}
+        # Write every replication as soon as it is done, an interrupted sweep keeps what finished
+        for future in as_completed(futures):
+            key, replication = futures[future]
+            writers[key].write(replication, future.result())
+    return cells
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description='UAS Package Simulator parameter sweep')
+    parser.add_argument('--replications', type=int, default=N_REPLICATIONS, help='number of replications of every cell')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes to run replications in')
+    parser.add_argument('--cache', default=CACHE_PATH, help='directory results are cached in')
+    parser.add_argument('--seed', type=int, default=BASE_SEED, help='base seed of the random streams')
+    parser.add_argument('--max_sim_time', type=type(MAX_SIM_TIME), default=MAX_SIM_TIME, help='minutes of every replication')
+    for name, values in GRID.items():
+        parser.add_argument('--' + name, type=type(values[0]), nargs='+', default=values)
+    return parser.parse_args(args)
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARN)
+    grid = {name: getattr(args, name) for name in GRID}
+    cells = run_sweep(grid, args.replications, args.workers, args.cache, args.seed, args.max_sim_time)
+    for cell in cells:
+        print('{} -> {} ({} replications run)'.format(
+            ', '.join('{}={}'.format(name, value) for name, value in cell['cell'].items()), cell['folder'], cell['run']))
+
+
+if __name__ == '__main__':
+    main()
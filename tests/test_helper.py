@@ -0,0 +1,24 @@
+"""Monitored queues keep recording after their time series was exported"""
+import simpy
+
+from simuas.helper import MonitoredStore, condense
+
+
+def test_record_after_condense():
+    env = simpy.Environment()
+    queue = MonitoredStore(env)
+
+    def process():
+        yield queue.put('a')
+        yield env.timeout(1)
+        exported = condense(queue)
+        yield queue.put('b')
+        yield env.timeout(1)
+        yield queue.get()
+        # the exported arrays are not changed by the later records
+        assert list(exported['cumulative_item_rec']) == [1]
+        assert list(condense(queue)['cumulative_item_rec']) == [1, 1, 2, 2, 1]
+        assert list(condense(queue)['cumulative_time_rec']) == [0, 1, 1, 2, 2]
+
+    env.process(process())
+    env.run()
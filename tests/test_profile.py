@@ -0,0 +1,18 @@
+"""Smoke test of the profile mode of the simulator"""
+import copy
+
+from simuas.main import OPTIONS, run_profile
+from simuas.helper import MonitoredMixin
+
+
+def test_run_profile(capsys):
+    options = copy.deepcopy(OPTIONS)
+    # the grid backend does not need mod_spatialite
+    options['collision_backend'] = 'grid'
+    original = MonitoredMixin.__dict__['_update_tracking']
+    run_profile(1, options, max_sim_time=30)
+    report = capsys.readouterr().out
+    assert 'Replication 0' in report
+    assert 'MonitoredMixin._update_tracking' in report
+    # every instrumented method is put back
+    assert MonitoredMixin.__dict__['_update_tracking'] is original
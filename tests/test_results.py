@@ -0,0 +1,33 @@
+"""Tests of writing and reading replication results"""
+import numpy as np
+
+from simuas.Results import ResultWriter, ResultReader
+
+
+def data_package(size):
+    queue = {'cumulative_time_rec': [0.0], 'cumulative_item_rec': [0], 'item_time_dict': {0: 1.0}}
+    data = {name: queue for name in ['charging_stations', 'uas_queue', 'battery_bank', 'uas_bank']}
+    data['packages'] = {'total_wait': np.arange(size, dtype=float)}
+    data['info'] = {'time': np.zeros(0), 'event': np.zeros(0, dtype=np.int8), 'uas': np.zeros(0, dtype=np.int64),
+                    'other': np.zeros(0, dtype=np.int64), 'value': np.zeros(0)}
+    return data
+
+
+def test_new_run_replaces_results(tmp_path):
+    writer = ResultWriter(str(tmp_path))
+    for replication in range(3):
+        writer.write(replication, [data_package(2)])
+    writer = ResultWriter(str(tmp_path))
+    writer.write(0, [data_package(5)])
+    reader = ResultReader(str(tmp_path))
+    assert reader.replications == [0]
+    assert len(reader.load('packages')['total_wait']) == 5
+    assert not (tmp_path / 'r0001').exists()
+
+
+def test_append_keeps_results(tmp_path):
+    ResultWriter(str(tmp_path)).write(0, [data_package(2)])
+    ResultWriter(str(tmp_path), append=True).write(1, [data_package(3)])
+    reader = ResultReader(str(tmp_path))
+    assert reader.replications == [0, 1]
+    assert len(reader.load('packages')['total_wait']) == 5
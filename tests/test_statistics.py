@@ -0,0 +1,17 @@
+"""Quantiles of the normal and student t distributions"""
+import math
+
+from simuas.Statistics import normal_quantile, t_quantile
+
+
+def test_normal_quantile():
+    assert normal_quantile(0.5) == 0.0
+    assert math.isclose(normal_quantile(0.975), 1.959963984540054, rel_tol=1e-8)
+    # lower tail and its mirror
+    assert math.isclose(normal_quantile(0.001), -3.090232306167813, rel_tol=1e-8)
+    assert math.isclose(normal_quantile(0.999), 3.090232306167813, rel_tol=1e-8)
+
+
+def test_t_quantile():
+    assert math.isclose(t_quantile(0.975, 1), 12.706204736174698, rel_tol=1e-9)
+    assert math.isclose(t_quantile(0.975, 10), 2.2281388519649385, rel_tol=1e-5)
@@ -0,0 +1,13 @@
+"""Tests of the parameter sweep cache"""
+from simuas.main import MAX_SIM_TIME, OPTIONS
+from simuas.sweep import cache_key, parse_args
+
+
+def test_max_sim_time_from_command_line_hits_default_cache():
+    args = parse_args(['--max_sim_time', str(MAX_SIM_TIME)])
+    assert cache_key(OPTIONS, 1, args.max_sim_time, 'v') == cache_key(OPTIONS, 1, MAX_SIM_TIME, 'v')
+
+
+def test_whole_floats_share_cache_key():
+    assert cache_key(OPTIONS, 1, 3000.0, 'v') == cache_key(OPTIONS, 1, 3000, 'v')
+    assert cache_key(OPTIONS, 1, 3000.5, 'v') != cache_key(OPTIONS, 1, 3000, 'v')